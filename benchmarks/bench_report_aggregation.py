@@ -0,0 +1,94 @@
+"""
+Benchmark de la agregación por agente del motor de reportes.
+
+Compara el filtrado por agente (O(agentes x filas)) contra el groupby de una pasada
+y el corte por límites de grupo, sobre Logs sintéticos. No escribe Excel ni toca la BD.
+
+    python benchmarks/bench_report_aggregation.py --rows 1000000 --agents 80
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.report_service as report_service
+from services.records import apply_dtypes
+
+RESULTS = ["WC Completed", "Not Completed - No Answer", "Not Completed - Hung Up", "Not Completed - Other"]
+
+def synthetic_logs(rows: int, agents: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    result = pd.Categorical.from_codes(rng.integers(0, len(RESULTS), rows), RESULTS)
+    df = pd.DataFrame({
+        "id": np.arange(rows),
+        "created_at": pd.Timestamp("2025-01-01", tz="UTC") + pd.to_timedelta(rng.integers(0, 180 * 86400, rows), unit="s"),
+        "agent": pd.Categorical.from_codes(rng.integers(0, agents, rows), [f"agent{i:03d}" for i in range(agents)]),
+        "cordoba_id": rng.integers(100000, 999999, rows).astype(str),
+        "result": result,
+        "is_completed": np.asarray(result == "WC Completed"),
+        "info_until": "Pitch",
+        "transfer_status": "Successful",
+        "comments": "",
+    })
+    return apply_dtypes(df)
+
+# --- Versión anterior (filtro por agente) ---
+
+def loop_aggregate(df: pd.DataFrame) -> dict:
+    acc = {}
+    for ag in df['agent'].unique():
+        ag_data = df[df['agent'] == ag]
+        acc[ag] = [len(ag_data), int(ag_data['is_completed'].sum())]
+    return acc
+
+def loop_slices(df: pd.DataFrame) -> int:
+    return sum(len(df[df['agent'] == ag]) for ag in df['agent'].unique())
+
+# --- Versión actual ---
+
+def grouped_aggregate(df: pd.DataFrame) -> pd.DataFrame:
+    return report_service._agent_summary(report_service._accumulate_agents(None, df), {})
+
+def grouped_slices(df: pd.DataFrame) -> int:
+    return sum(len(part) for _, part in report_service._agent_slices(df))
+
+def _timed(fn, df, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(df)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--agents", type=int, default=80)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = synthetic_logs(args.rows, args.agents)
+
+    # Mismos números con ambos caminos
+    summary = grouped_aggregate(df).set_index('agent')
+    for ag, (total, completed) in loop_aggregate(df).items():
+        assert summary.loc[ag, 'total'] == total and summary.loc[ag, 'completed'] == completed
+    assert grouped_slices(df) == loop_slices(df) == len(df)
+
+    print(f"{args.rows:,} filas, {args.agents} agentes (mejor de {args.repeat})")
+    # Orden del Operativo: agentes contiguos, como llegan del SQL
+    df_sorted = df.sort_values(['agent', 'created_at'], ascending=[True, False], kind='stable')
+    for label, old_fn, new_fn, data in (
+        ("Ranking (total/completed/conversión)", loop_aggregate, grouped_aggregate, df),
+        ("Hojas por agente (sin orden)", loop_slices, grouped_slices, df),
+        ("Hojas por agente (orden SQL)", loop_slices, grouped_slices, df_sorted),
+    ):
+        t_old, t_new = _timed(old_fn, data, args.repeat), _timed(new_fn, data, args.repeat)
+        print(f"  {label:<38} filtro: {t_old:7.3f}s   groupby: {t_new:7.3f}s   x{t_old / t_new:5.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Paridad de reportes: snapshot Parquet vs. exporte desde la BD.
+
+Crea una BD SQLite temporal con Logs sintéticos de dos meses cerrados, construye el snapshot
+(services/snapshot_service.py) y, para cada orden de report_service.REPORT_ORDER, con todos
+los agentes y con un solo agente, compara las filas de iter_snapshot_logs contra
+admin_service.iter_logs_for_export (mismos ids y resultados en el mismo orden, mismo conteo).
+Los reportes que leen del snapshot (SNAPSHOT_REPORTS) se generan completos a Excel.
+Después edita una nota del primer mes: el snapshot deja de cubrir el rango hasta el
+próximo refresco, que reconstruye ese mes y vuelve a coincidir con la BD.
+Sale con código 1 ante cualquier diferencia. No toca la BD ni los directorios de la app.
+
+    python benchmarks/check_snapshot_reports.py
+    python benchmarks/check_snapshot_reports.py --rows 50000 --chunksize 700
+"""
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+from types import SimpleNamespace
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytz
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, text
+
+import services.storage as storage
+import services.admin_service as admin_service
+import services.archive_service as archive_service
+import services.report_service as report_service
+import services.snapshot_service as snapshot_service
+from services.archive_service import add_months, month_start
+from services.records import LOG_EXPORT_COLUMNS
+
+AGENTS = {"ana": "Ana Pérez", "Bob": "Bob / Ventas", "bob": "Bob / Ventas", "zed": "Zed", "test": "Test"}
+
+RESULTS = ["WC Completed", "Not Completed - No Answer", "Not Completed - Hung Up"]
+
+# --- Helpers ---
+
+def _point_dirs(tmp: str):
+    """Snapshot y archivo en el directorio temporal (no pisa data/ de la app)."""
+    snapshot_service.SNAPSHOT_DIR = os.path.join(tmp, "snapshot")
+    snapshot_service.MANIFEST_PATH = os.path.join(snapshot_service.SNAPSHOT_DIR, "_manifest.json")
+    archive_service.ARCHIVE_DIR = os.path.join(tmp, "archive")
+
+def seed(engine, rows: int, first: date, seed: int = 7):
+    """Notas con created_at distintos (sin empates: el orden es determinístico en ambos lados)."""
+    rng = np.random.default_rng(seed)
+    start = pytz.utc.localize(datetime.combine(first, datetime.min.time()))
+    span = int((add_months(first, 2) - first).total_seconds())
+    offsets = np.sort(rng.choice(span, rows, replace=False))
+    agents = list(AGENTS)
+    with engine.begin() as db:
+        for username, name in AGENTS.items():
+            db.execute(text("""INSERT INTO "Users" (username, name, password, role) VALUES (:u, :n, 'x', 'Agent')
+                               ON CONFLICT (username) DO NOTHING"""), {"u": username, "n": name})
+        ids = dict(db.execute(text('SELECT username, id FROM "Users"')).fetchall())
+        db.execute(text("""
+            INSERT INTO "Logs" (created_at, user_id, agent, cordoba_id, result, comments, affiliate,
+                                info_until, client_language, transfer_status)
+            VALUES (:ts, :uid, :agent, :cid, :res, '', 'Titan', 'Pitch', 'EN', 'Successful')
+        """), [
+            {"ts": start + timedelta(seconds=int(off)), "uid": ids[ag], "agent": ag,
+             "cid": str(100000 + i), "res": RESULTS[int(rng.integers(len(RESULTS)))]}
+            for i, (off, ag) in enumerate(zip(offsets, rng.choice(agents, rows)))
+        ])
+
+def compare(conn, start, end, target, report_type, chunksize) -> list:
+    errors = []
+    order_by = report_service.REPORT_ORDER[report_type]
+    snap = list(snapshot_service.iter_snapshot_logs(start, end, target, LOG_EXPORT_COLUMNS, order_by, chunksize))
+    live = list(admin_service.iter_logs_for_export(conn, start, end, target, order_by, chunksize))
+    snap_ids = [i for chunk in snap for i in chunk['id']]
+    live_ids = [i for chunk in live for i in chunk['id']]
+    label = f"{target} / {report_type}"
+    if snap_ids != live_ids:
+        errors.append(f"{label}: {len(snap_ids)} filas del snapshot vs {len(live_ids)} de la BD (u orden distinto)")
+    elif [r for chunk in snap for r in chunk['result']] != [r for chunk in live for r in chunk['result']]:
+        errors.append(f"{label}: mismas filas pero con otro resultado (snapshot desactualizado)")
+    if snapshot_service.count_snapshot_logs(start, end, target) != len(live_ids):
+        errors.append(f"{label}: count_snapshot_logs no coincide con la BD")
+    if any(len(chunk) > chunksize for chunk in snap):
+        errors.append(f"{label}: bloque del snapshot más grande que chunksize")
+    print(f"  {label:<58} {len(snap_ids):>7} filas {'OK' if not errors else 'DIFERENTE'}")
+    return errors
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--chunksize", type=int, default=1000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="snapshot_check_")
+    try:
+        _point_dirs(tmp)
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'check.db')}")
+        storage.prepare_engine(engine)
+        conn = SimpleNamespace(engine=engine)
+
+        # Dos meses ya cerrados: el snapshot los cubre
+        first = add_months(month_start(date.today()), -3)
+        seed(engine, args.rows, first)
+        snapshot_service.build_snapshot(conn, full=True)
+
+        start, end = first + timedelta(days=3), add_months(first, 2) - timedelta(days=5)
+        errors = [] if snapshot_service.covers(start, end) else ["el snapshot no cubre el rango cerrado"]
+        user_map = dict(AGENTS)
+
+        print(f"\nRango {start} -> {end}")
+        for target in ("TODOS", "ANA", "bob"):
+            for report_type, order_by in report_service.REPORT_ORDER.items():
+                errors += compare(conn, start, end, target, report_type, args.chunksize)
+                if report_type not in report_service.SNAPSHOT_REPORTS: continue
+                chunks = snapshot_service.iter_snapshot_logs(start, end, target, LOG_EXPORT_COLUMNS, order_by, args.chunksize)
+                path = os.path.join(tmp, "reporte.xlsx")
+                try:
+                    report_service.build_report_file(chunks, user_map, report_type, path)
+                except Exception as e:
+                    errors.append(f"{target} / {report_type}: el reporte desde el snapshot falló: {e!r}")
+
+        # Nota editada en un mes cerrado (Quirófano): ese mes deja de servirse hasta el refresco
+        with engine.begin() as db:
+            log_id, created_at = db.execute(text(
+                'SELECT id, created_at FROM "Logs" WHERE created_at >= :s ORDER BY created_at LIMIT 1'
+            ), {"s": start}).one()
+            db.execute(text('UPDATE "Logs" SET result = \'Not Completed - Edited\' WHERE id = :id'), {"id": log_id})
+        snapshot_service.mark_stale(pd.to_datetime(created_at, utc=True).date())
+        print(f"\nNota {log_id} editada")
+        if snapshot_service.covers(start, end):
+            errors.append("el snapshot sigue cubriendo un mes con una nota editada")
+        snapshot_service.build_snapshot(conn)
+        if not snapshot_service.covers(start, end):
+            errors.append("el refresco no volvió a cubrir el mes editado")
+        for report_type in report_service.REPORT_ORDER:
+            errors += compare(conn, start, end, "TODOS", report_type, args.chunksize)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if errors:
+        print("\n❌ Snapshot y BD no coinciden:")
+        for e in errors:
+            print(f"  - {e}")
+        sys.exit(1)
+    print("\n✅ Snapshot y BD entregan las mismas filas en el mismo orden")
+
+if __name__ == "__main__":
+    main()
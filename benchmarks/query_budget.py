@@ -0,0 +1,253 @@
+"""
+Presupuesto de consultas por rerun, por vista.
+
+Siembra un fixture determinístico en un SQLite temporal (services/storage.py): noticias
+activas (algunas sin leer), notas de los últimos días, acreedores, afiliados y códigos no
+encontrados, N de cada cosa. Renderiza cada vista de main.py con AppTest contra esa BD y
+cuenta las sentencias que llegan al engine por función de servicio (listeners de
+metrics_service). Después repite con el fixture al doble (2N): si algún conteo cambia, hay
+una consulta por fila (N+1). Compara contra benchmarks/query_budget.json (grabado con N) y
+sale con código 1 si alguna vista se pasa o crece con N.
+
+    python benchmarks/query_budget.py
+    python benchmarks/query_budget.py --record   # reescribe el presupuesto
+
+Por vista se mide:
+  cold  -> primer rerun con las cachés de datos vacías (total de sentencias)
+  warm  -> rerun siguiente, cachés llenas (sentencias por función: es el costo de cada clic)
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+from sqlalchemy import create_engine, text
+
+import pytz
+
+import services.metrics_service as metrics_service
+import services.storage as storage
+import services.stats_service as stats_service
+import services.kpi_service as kpi_service
+import services.user_directory as user_directory
+import services.presence_service as presence_service
+
+BUDGET_PATH = os.path.join(ROOT, "benchmarks", "query_budget.json")
+
+# Etiqueta del radio de navegación en main.py (ruta de Admin)
+VIEWS = {
+    "admin_panel": "🎛️ Admin Panel",
+    "inicio": "🏠 Inicio",
+    "buscador": "🔍 Buscador",
+    "notas": "📝 Notas",
+    "updates": "🔔 Novedades",
+}
+
+# Tamaño del fixture con el que se graba el presupuesto (la verificación de N+1 usa el doble)
+FIXTURE_SIZE = 8
+
+FIXTURE_AGENTS = ("ana", "bob", "carla")
+
+CATEGORIES = ("Critical", "Warning", "Info")
+
+RESULTS = ("WC Completed", "Not Completed - No Answer", "Not Completed - Hung Up")
+
+SQL_ADMIN = """
+    SELECT id, username, name, role FROM "Users"
+    WHERE role = 'Admin' AND COALESCE(active, TRUE)
+    ORDER BY id LIMIT 1
+"""
+
+# --- Fixture ---
+
+def seed_fixture(engine, n: int):
+    """
+    n noticias activas (la mitad leídas por el admin) + 2 archivadas, n notas por usuario y día
+    en los últimos 3 días (incluye hoy), 25n acreedores y n códigos no encontrados.
+    """
+    now = datetime.now(pytz.utc)
+    with engine.begin() as db:
+        db.execute(text("""INSERT INTO "Users" (username, name, password, role) VALUES (:u, :n, 'x', 'Agent')"""),
+                   [{"u": ag, "n": ag.title()} for ag in FIXTURE_AGENTS])
+        users = db.execute(text('SELECT id, username FROM "Users"')).fetchall()
+        db.execute(text('INSERT INTO "Creditors" (name, abreviation) VALUES (:n, :a)'),
+                   [{"n": f"Creditor {i}", "a": f"CR{i:04d}"} for i in range(25 * n)])
+        db.execute(text('INSERT INTO "Search_Misses" (abreviation, cordoba_id) VALUES (:a, :c)'),
+                   [{"a": f"MISS{i}", "c": str(1000 + i)} for i in range(n)])
+        db.execute(text("""INSERT INTO "Updates" (date, title, message, category, active)
+                           VALUES (:d, :t, :m, :c, :a)"""), [
+            {"d": (now - timedelta(days=i)).date().isoformat(), "t": f"Aviso {i}", "m": f"Mensaje de prueba {i}",
+             "c": CATEGORIES[i % len(CATEGORIES)], "a": i < n}
+            for i in range(n + 2)
+        ])
+        update_ids = [r[0] for r in db.execute(text('SELECT id FROM "Updates" WHERE active = TRUE ORDER BY id'))]
+        db.execute(text('INSERT INTO "Updates_Reads" (update_id, username) VALUES (:id, \'admin\')'),
+                   [{"id": uid} for uid in update_ids[::2]])
+        db.execute(text("""
+            INSERT INTO "Logs" (created_at, user_id, agent, cordoba_id, result, comments, affiliate,
+                                info_until, client_language, transfer_status)
+            VALUES (:ts, :uid, :agent, :cid, :res, '', 'Titan', 'Pitch', 'EN', 'Successful')
+        """), [
+            {"ts": now - timedelta(days=day, minutes=5 * (i + 1)), "uid": uid, "agent": username,
+             "cid": str(100000 + day * 1000 + i), "res": RESULTS[i % len(RESULTS)]}
+            for uid, username in users for day in range(3) for i in range(n)
+        ])
+    stats_service.rebuild_daily_stats(SimpleNamespace(engine=engine))
+
+def _reset_process_state():
+    """Cachés y registros del proceso que apuntan a la BD anterior."""
+    presence_service.flush_presence()
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    user_directory.invalidate()
+    kpi_service.invalidate()
+
+# --- Helpers ---
+
+def _counts() -> dict:
+    """Valor actual de db_queries_total por caller."""
+    return {
+        s.labels["caller"]: s.value
+        for metric in metrics_service.DB_QUERIES.collect()
+        for s in metric.samples if s.name == "db_queries_total"
+    }
+
+def _delta(before: dict, after: dict) -> dict:
+    return {k: int(v - before.get(k, 0)) for k, v in after.items() if v - before.get(k, 0) > 0}
+
+def _run(at: AppTest) -> dict:
+    before = _counts()
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return _delta(before, _counts())
+
+def measure_view(label: str, user: dict, timeout: float) -> dict:
+    at = AppTest.from_file(os.path.join(ROOT, "main.py"), default_timeout=timeout)
+    # Sesión ya logueada (mismo estado que deja login.show)
+    for key, value in {
+        "logged_in": True,
+        "username": user["username"],
+        "real_name": user["name"],
+        "role": user["role"],
+        "user_id": int(user["id"]),
+    }.items():
+        at.session_state[key] = value
+    _run(at)
+    at.sidebar.radio[0].set_value(label)
+    st.cache_data.clear()
+    user_directory.invalidate()
+    # Latidos encolados: que el timer de fondo no escriba a mitad de la medición
+    presence_service.flush_presence()
+    cold = _run(at)
+    warm = _run(at)
+    return {"cold": sum(cold.values()), "warm": warm}
+
+def measure_fixture(n: int, views: list, timeout: float) -> dict:
+    """Siembra el fixture de tamaño n en un SQLite temporal y mide las vistas contra él."""
+    tmp = tempfile.mkdtemp(prefix="query_budget_")
+    try:
+        url = f"sqlite:///{os.path.join(tmp, 'budget.db')}"
+        engine = create_engine(url)
+        # Crea el esquema (con el admin por defecto) antes de sembrar
+        storage.prepare_engine(engine)
+        seed_fixture(engine, n)
+        with engine.connect() as db:
+            user = dict(db.execute(text(SQL_ADMIN)).mappings().first())
+        engine.dispose()
+
+        # main.py se conecta por DATABASE_URL (conexion.py)
+        os.environ["DATABASE_URL"] = url
+        _reset_process_state()
+        measured = {view: measure_view(VIEWS[view], user, timeout) for view in views}
+        _reset_process_state()
+        return measured
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def check_growth(base: dict, grown: dict) -> list:
+    """Conteos que cambian al duplicar el fixture: una consulta por fila en algún lado."""
+    errors = []
+    for view, got in base.items():
+        other = grown[view]
+        if other["cold"] != got["cold"]:
+            errors.append(f"{view}: cold {got['cold']} con N={FIXTURE_SIZE} vs {other['cold']} con 2N")
+        for caller in sorted(set(got["warm"]) | set(other["warm"])):
+            a, b = got["warm"].get(caller, 0), other["warm"].get(caller, 0)
+            if a != b:
+                errors.append(f"{view}: {caller} {a} con N={FIXTURE_SIZE} vs {b} con 2N por rerun")
+    return errors
+
+def check(measured: dict, budget: dict) -> list:
+    """Lista de violaciones (vacía si todo entra en el presupuesto)."""
+    errors = []
+    for view, got in measured.items():
+        limit = budget.get(view)
+        if limit is None:
+            errors.append(f"{view}: sin presupuesto (correr con --record)")
+            continue
+        if got["cold"] > limit["cold"]:
+            errors.append(f"{view}: cold {got['cold']} > {limit['cold']}")
+        for caller, n in got["warm"].items():
+            allowed = limit["warm"].get(caller, 0)
+            if n > allowed:
+                errors.append(f"{view}: {caller} {n} > {allowed} por rerun")
+    return errors
+
+def _print(measured: dict, budget: dict):
+    for view, got in measured.items():
+        limit = budget.get(view, {"cold": "-", "warm": {}})
+        print(f"\n{view}: cold {got['cold']} (presupuesto {limit['cold']}) | warm {sum(got['warm'].values())}")
+        for caller in sorted(set(got["warm"]) | set(limit["warm"])):
+            print(f"  {caller:<58} {got['warm'].get(caller, 0):>3} / {limit['warm'].get(caller, 0)}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--record", action="store_true", help="Guarda lo medido como nuevo presupuesto")
+    parser.add_argument("--views", nargs="*", default=list(VIEWS), choices=list(VIEWS))
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    measured = measure_fixture(FIXTURE_SIZE, args.views, args.timeout)
+    growth = check_growth(measured, measure_fixture(2 * FIXTURE_SIZE, args.views, args.timeout))
+    if growth:
+        print("\n❌ Consultas que crecen con el tamaño de los datos:")
+        for e in growth:
+            print(f"  - {e}")
+        sys.exit(1)
+
+    try:
+        with open(BUDGET_PATH, encoding="utf-8") as f:
+            budget = json.load(f)
+    except OSError:
+        budget = {}
+
+    if args.record:
+        budget.update(measured)
+        with open(BUDGET_PATH, "w", encoding="utf-8") as f:
+            json.dump(budget, f, indent=2, sort_keys=True)
+            f.write("\n")
+        _print(measured, budget)
+        print(f"\nPresupuesto guardado en {BUDGET_PATH}")
+        return
+
+    _print(measured, budget)
+    errors = check(measured, budget)
+    if errors:
+        print("\n❌ Presupuesto excedido:")
+        for e in errors:
+            print(f"  - {e}")
+        sys.exit(1)
+    print("\n✅ Todas las vistas dentro del presupuesto")
+
+if __name__ == "__main__":
+    main()
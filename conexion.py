@@ -1,11 +1,13 @@
 # vistas/conexion.py
 import os
 import streamlit as st
+import services.metrics_service as metrics_service
+import services.storage as storage
 
 def get_db_connection():
     """
     Función centralizada para conectar a la base de datos.
-    Soporta Docker (Variables de entorno).
+    Soporta Docker (Variables de entorno). DATABASE_URL=sqlite:///... usa SQLite embebido.
     """
     try:
         # 1. Intenta leer la variable de entorno desde Docker
@@ -13,11 +15,16 @@ def get_db_connection():
         
         if db_url:
             # Si estamos en Docker, usamos la URL inyectada
-            return st.connection("local_db", type="sql", url=db_url)
+            conn = st.connection("local_db", type="sql", url=db_url)
         else:
             # Si estamos en local (sin Docker), busca en .streamlit/secrets.toml
             # Busca automáticamente una sección [connections.local_db]
-            return st.connection("local_db", type="sql")
+            conn = st.connection("local_db", type="sql")
+        # SQLite: pragmas WAL, funciones y esquema (no-op en Postgres; idempotente por engine)
+        storage.prepare_engine(conn.engine)
+        # Conteo/latencia de consultas y uso del pool (idempotente por engine)
+        metrics_service.instrument_engine(conn.engine)
+        return conn
             
     except Exception as e:
         print(f"⚠️ Error de conexión centralizado: {e}")
@@ -58,4 +58,263 @@ VALUES ('admin', 'System Administrator', '$2b$12$VTtjK6Vlk4kAqWpvjF/SXu5suttIRYD
 ON CONFLICT (username) DO NOTHING;
 
 -- DATOS INICIALES DE EJEMPLO (Opcional)
-INSERT INTO "Affiliates" (name) VALUES ('Patriot'), ('Cordoba Legal'), ('Titan') ON CONFLICT DO NOTHING;
\ No newline at end of file
+INSERT INTO "Affiliates" (name) VALUES ('Patriot'), ('Cordoba Legal'), ('Titan') ON CONFLICT DO NOTHING;
+
+-- ==========================================================
+-- EVOLUCIONES DE ESQUEMA
+-- Sentencias idempotentes: se pueden re-ejecutar con psql sobre una BD ya existente.
+-- ==========================================================
+
+-- Logs: estado de transferencia (ya usado por notes_service)
+ALTER TABLE "Logs" ADD COLUMN IF NOT EXISTS transfer_status TEXT;
+
+-- Logs: clave de idempotencia (cordoba_id + usuario + resultado + ventana de tiempo).
+-- Los reintentos/doble click/segunda pestaña chocan contra la PK de "Logs_Idempotency" y no
+-- duplican la nota. Vive en su propia tabla porque en "Logs" particionada un UNIQUE tendría
+-- que incluir created_at (y dos reintentos nunca tienen el mismo created_at).
+-- Logs.idempotency_key queda solo como campo de auditoría (qué clave reservó la nota; sin
+-- índice ni restricción, nada la consulta). Las filas históricas quedan en NULL.
+ALTER TABLE "Logs" ADD COLUMN IF NOT EXISTS idempotency_key TEXT;
+DROP INDEX IF EXISTS "Logs_idempotency_key_idx";
+CREATE TABLE IF NOT EXISTS "Logs_Idempotency" (
+    idempotency_key TEXT PRIMARY KEY,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Logs: historial por agente con paginación keyset (notes_service.fetch_agent_history)
+CREATE INDEX IF NOT EXISTS "Logs_user_created_id_idx" ON "Logs" (user_id, created_at DESC, id DESC);
+
+-- Rollup diario por agente (Inicio > Performance Tracker).
+-- Una fila por (agente, día ET, resultado); notes_service.commit_log la incrementa en la misma transacción.
+CREATE TABLE IF NOT EXISTS "Agent_Daily_Stats" (
+    user_id INTEGER NOT NULL REFERENCES "Users"(id),
+    day_et DATE NOT NULL,
+    result TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day_et, result)
+);
+
+-- Backfill / reconstrucción completa desde Logs (re-ejecutable)
+INSERT INTO "Agent_Daily_Stats" (user_id, day_et, result, total)
+SELECT user_id, (created_at AT TIME ZONE 'US/Eastern')::date, result, COUNT(*)
+FROM "Logs"
+WHERE user_id IS NOT NULL
+GROUP BY 1, 2, 3
+ON CONFLICT (user_id, day_et, result) DO UPDATE SET total = EXCLUDED.total;
+
+-- Clasificación Completed / Not Completed almacenada (antes: string-matching en 5 lugares).
+-- Columnas generadas STORED: el ADD COLUMN reescribe la tabla y calcula todas las filas
+-- existentes (ese es el backfill); las nuevas filas se calculan solas en cada INSERT/UPDATE.
+ALTER TABLE "Logs" ADD COLUMN IF NOT EXISTS is_completed BOOLEAN
+    GENERATED ALWAYS AS (result ILIKE '%completed%' AND result NOT ILIKE '%not%') STORED;
+ALTER TABLE "Logs" ADD COLUMN IF NOT EXISTS result_reason TEXT
+    GENERATED ALWAYS AS (
+        CASE WHEN result ILIKE '%completed%' AND result NOT ILIKE '%not%' THEN NULL
+             ELSE btrim(regexp_replace(result, '^\s*Not Completed\s*-\s*', '', 'i'))
+        END
+    ) STORED;
+CREATE INDEX IF NOT EXISTS "Logs_created_completed_idx" ON "Logs" (created_at, is_completed);
+
+-- Mismas columnas en el rollup (mismo criterio que Logs)
+ALTER TABLE "Agent_Daily_Stats" ADD COLUMN IF NOT EXISTS is_completed BOOLEAN
+    GENERATED ALWAYS AS (result ILIKE '%completed%' AND result NOT ILIKE '%not%') STORED;
+ALTER TABLE "Agent_Daily_Stats" ADD COLUMN IF NOT EXISTS result_reason TEXT
+    GENERATED ALWAYS AS (
+        CASE WHEN result ILIKE '%completed%' AND result NOT ILIKE '%not%' THEN NULL
+             ELSE btrim(regexp_replace(result, '^\s*Not Completed\s*-\s*', '', 'i'))
+        END
+    ) STORED;
+
+-- Confirmaciones de lectura de noticias (faltaba en el esquema local).
+-- La PK (update_id, username) sirve al conteo agrupado por noticia del panel admin.
+CREATE TABLE IF NOT EXISTS "Updates_Reads" (
+    update_id INT REFERENCES "Updates"(id) ON DELETE CASCADE,
+    username TEXT NOT NULL,
+    read_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (update_id, username)
+);
+
+-- Códigos no encontrados reportados desde el Buscador (faltaba en el esquema local)
+CREATE TABLE IF NOT EXISTS "Search_Misses" (
+    id SERIAL PRIMARY KEY,
+    abreviation TEXT NOT NULL,
+    cordoba_id TEXT,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Presencia del staff ("Staff Online"): una fila por usuario, la escribe presence_service en lotes
+CREATE TABLE IF NOT EXISTS "User_Presence" (
+    username TEXT PRIMARY KEY,
+    user_id INT REFERENCES "Users"(id) ON DELETE CASCADE,
+    view TEXT,
+    last_seen TIMESTAMPTZ NOT NULL,
+    last_active TIMESTAMPTZ NOT NULL
+);
+CREATE INDEX IF NOT EXISTS "User_Presence_last_seen_idx" ON "User_Presence" (last_seen);
+
+-- Búsqueda de acreedores del panel admin (ILIKE '%...%' paginado): índices trigram
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS "Creditors_name_trgm_idx" ON "Creditors" USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS "Creditors_abreviation_trgm_idx" ON "Creditors" USING gin (abreviation gin_trgm_ops);
+
+-- ==========================================================
+-- Logs PARTICIONADA POR MES (RANGE created_at)
+-- Cada mes es una tabla "Logs_YYYY_MM" (límites en UTC). Las consultas por rango de fechas
+-- solo tocan los meses involucrados y los meses viejos se archivan a Parquet
+-- (services/archive_service.py) con DETACH + DROP, sin DELETE masivos.
+-- ==========================================================
+
+-- Crea las particiones mensuales faltantes desde `from_month` hasta `months_ahead` meses
+-- después del mes actual. La llama el job de mantenimiento para tener meses creados por adelantado.
+-- Si el job estuvo parado y hay filas en "Logs_default", arranca desde el mes más viejo de esas
+-- filas y las pasa a su mes: Postgres no deja crear una partición mientras el default tenga filas
+-- de su rango, así que se copian aparte, se borran del default, se crea el mes y se re-insertan
+-- (mismos id) en la misma transacción.
+CREATE OR REPLACE FUNCTION ensure_logs_partitions(from_month DATE, months_ahead INT DEFAULT 3)
+RETURNS INT LANGUAGE plpgsql AS $$
+DECLARE
+    m DATE := date_trunc('month', from_month)::date;
+    last_month DATE := (date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => months_ahead))::date;
+    has_default BOOLEAN := to_regclass('"Logs_default"') IS NOT NULL;
+    cols TEXT := 'id, created_at, user_id, agent, customer, cordoba_id, result, comments, '
+              || 'affiliate, info_until, client_language, transfer_status, idempotency_key';
+    oldest DATE;
+    lo TIMESTAMPTZ;
+    hi TIMESTAMPTZ;
+    moved BIGINT;
+    part TEXT;
+    created INT := 0;
+BEGIN
+    IF has_default THEN
+        EXECUTE 'SELECT (date_trunc(''month'', MIN(created_at) AT TIME ZONE ''UTC''))::date FROM "Logs_default"' INTO oldest;
+        m := LEAST(m, oldest);
+    END IF;
+
+    WHILE m <= last_month LOOP
+        part := 'Logs_' || to_char(m, 'YYYY_MM');
+        IF to_regclass(quote_ident(part)) IS NULL THEN
+            lo := m::timestamp AT TIME ZONE 'UTC';
+            hi := (m + interval '1 month')::timestamp AT TIME ZONE 'UTC';
+            moved := 0;
+            IF has_default THEN
+                EXECUTE format(
+                    'CREATE TEMP TABLE logs_default_moved AS SELECT %s FROM "Logs_default" WHERE created_at >= %L AND created_at < %L',
+                    cols, lo, hi
+                );
+                GET DIAGNOSTICS moved = ROW_COUNT;
+                IF moved > 0 THEN
+                    EXECUTE format('DELETE FROM "Logs_default" WHERE created_at >= %L AND created_at < %L', lo, hi);
+                END IF;
+            END IF;
+
+            EXECUTE format('CREATE TABLE %I PARTITION OF "Logs" FOR VALUES FROM (%L) TO (%L)', part, lo, hi);
+
+            IF has_default THEN
+                IF moved > 0 THEN
+                    EXECUTE format('INSERT INTO "Logs" (%s) SELECT %s FROM logs_default_moved', cols, cols);
+                    RAISE NOTICE 'Logs_default: % filas movidas a %', moved, part;
+                END IF;
+                DROP TABLE logs_default_moved;
+            END IF;
+            created := created + 1;
+        END IF;
+        m := (m + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END $$;
+
+-- Migración en sitio (solo si "Logs" todavía es una tabla normal): se renombra la tabla vieja,
+-- se crea la particionada con el mismo esquema y secuencia, se crean los meses que cubren
+-- los datos existentes y se mueven las filas en la misma transacción.
+DO $$
+DECLARE
+    first_month DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('"Logs"')) = 'r' THEN
+        ALTER TABLE "Logs" RENAME TO "Logs_legacy";
+        ALTER INDEX IF EXISTS "Logs_pkey" RENAME TO "Logs_legacy_pkey";
+        DROP INDEX IF EXISTS "Logs_user_created_id_idx";
+        DROP INDEX IF EXISTS "Logs_created_completed_idx";
+
+        CREATE TABLE "Logs" (
+            id INTEGER NOT NULL DEFAULT nextval('"Logs_id_seq"'),
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+            user_id INTEGER REFERENCES "Users"(id),
+            agent TEXT NOT NULL,
+            customer TEXT,
+            cordoba_id TEXT NOT NULL,
+            result TEXT NOT NULL,
+            comments TEXT,
+            affiliate TEXT,
+            info_until TEXT,
+            client_language TEXT,
+            transfer_status TEXT,
+            idempotency_key TEXT,
+            is_completed BOOLEAN
+                GENERATED ALWAYS AS (result ILIKE '%completed%' AND result NOT ILIKE '%not%') STORED,
+            result_reason TEXT
+                GENERATED ALWAYS AS (
+                    CASE WHEN result ILIKE '%completed%' AND result NOT ILIKE '%not%' THEN NULL
+                         ELSE btrim(regexp_replace(result, '^\s*Not Completed\s*-\s*', '', 'i'))
+                    END
+                ) STORED,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at);
+        ALTER SEQUENCE "Logs_id_seq" OWNED BY "Logs".id;
+
+        -- Red de seguridad para fechas fuera de los meses creados (debe quedar vacía)
+        CREATE TABLE "Logs_default" PARTITION OF "Logs" DEFAULT;
+
+        SELECT MIN(created_at AT TIME ZONE 'UTC')::date INTO first_month FROM "Logs_legacy";
+        PERFORM ensure_logs_partitions(COALESCE(first_month, (now() AT TIME ZONE 'UTC')::date));
+
+        INSERT INTO "Logs" (
+            id, created_at, user_id, agent, customer, cordoba_id, result, comments,
+            affiliate, info_until, client_language, transfer_status, idempotency_key
+        )
+        SELECT id, COALESCE(created_at, NOW()), user_id, agent, customer, cordoba_id, result, comments,
+               affiliate, info_until, client_language, transfer_status, idempotency_key
+        FROM "Logs_legacy";
+
+        DROP TABLE "Logs_legacy";
+    END IF;
+END $$;
+
+-- Índices particionados (se propagan a cada mes, incluidos los que se creen después)
+CREATE INDEX IF NOT EXISTS "Logs_user_created_id_idx" ON "Logs" (user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS "Logs_created_completed_idx" ON "Logs" (created_at, is_completed);
+
+-- ==========================================================
+-- updated_at EN TABLAS MUTABLES (sincronización incremental: migrar_datos.py --sync)
+-- El trigger solo pisa updated_at si el UPDATE no lo trae: la sincronización conserva el del origen.
+-- En Supabase se aplica una vez con: python migrar_datos.py --preparar-origen
+-- ==========================================================
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.updated_at IS NOT DISTINCT FROM OLD.updated_at THEN
+        NEW.updated_at := NOW();
+    END IF;
+    RETURN NEW;
+END $$;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['Users', 'Creditors', 'Affiliates', 'Updates'] LOOP
+        EXECUTE format('ALTER TABLE %I ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()', t);
+        EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON %I (updated_at, id)', t || '_updated_at_idx', t);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t || '_set_updated_at', t);
+        EXECUTE format('CREATE TRIGGER %I BEFORE UPDATE ON %I FOR EACH ROW EXECUTE FUNCTION set_updated_at()', t || '_set_updated_at', t);
+    END LOOP;
+END $$;
+
+-- Novedades: búsqueda de texto completo sobre título (peso A) + mensaje (peso B).
+-- Config 'simple': los avisos mezclan español e inglés (sin stemming de un solo idioma).
+ALTER TABLE "Updates" ADD COLUMN IF NOT EXISTS search_tsv tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(message, '')), 'B')
+    ) STORED;
+CREATE INDEX IF NOT EXISTS "Updates_search_tsv_idx" ON "Updates" USING gin (search_tsv);
+CREATE INDEX IF NOT EXISTS "Updates_active_date_idx" ON "Updates" (active, date DESC);
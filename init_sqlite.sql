@@ -0,0 +1,177 @@
+-- ==========================================================
+-- ESQUEMA SQLITE (services/storage.py, DATABASE_URL=sqlite:///...)
+-- Mismas tablas, columnas e índices que init.sql para un solo nodo sin servidor.
+-- Diferencias: sin particiones ni archivo a Parquet, texto completo de Novedades con FTS5
+-- y timestamps como texto UTC ordenable ('YYYY-MM-DD HH:MM:SS.fff+00:00').
+-- Idempotente: storage.prepare_engine lo aplica en cada arranque.
+-- ==========================================================
+
+-- Tabla de Usuarios
+CREATE TABLE IF NOT EXISTS "Users" (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT 'Agent',
+    active BOOLEAN DEFAULT TRUE,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f+00:00', 'now')),
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f+00:00', 'now'))
+);
+
+-- Tabla de Acreedores (Bancos)
+CREATE TABLE IF NOT EXISTS "Creditors" (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    abreviation TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f+00:00', 'now')),
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f+00:00', 'now'))
+);
+
+-- Tabla de Afiliados
+CREATE TABLE IF NOT EXISTS "Affiliates" (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    active BOOLEAN DEFAULT TRUE,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f+00:00', 'now'))
+);
+
+-- Tabla de Logs (Notas). AUTOINCREMENT: ids nunca reutilizados (watermark de kpi_service)
+CREATE TABLE IF NOT EXISTS "Logs" (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f+00:00', 'now')),
+    user_id INTEGER REFERENCES "Users"(id),
+    agent TEXT NOT NULL,
+    customer TEXT,
+    cordoba_id TEXT NOT NULL,
+    result TEXT NOT NULL,
+    comments TEXT,
+    affiliate TEXT,
+    info_until TEXT,
+    client_language TEXT,
+    transfer_status TEXT,
+    idempotency_key TEXT,   -- solo auditoría: la deduplicación es la PK de "Logs_Idempotency"
+    -- Mismo criterio que las columnas generadas de init.sql (LIKE de SQLite ya ignora mayúsculas)
+    is_completed BOOLEAN
+        GENERATED ALWAYS AS (result LIKE '%completed%' AND result NOT LIKE '%not%') STORED,
+    result_reason TEXT
+        GENERATED ALWAYS AS (
+            CASE WHEN result LIKE '%completed%' AND result NOT LIKE '%not%' THEN NULL
+                 WHEN ltrim(result) LIKE 'not completed%' AND ltrim(substr(ltrim(result), 14)) LIKE '-%'
+                     THEN trim(substr(ltrim(substr(ltrim(result), 14)), 2))
+                 ELSE trim(result)
+            END
+        ) STORED
+);
+CREATE INDEX IF NOT EXISTS "Logs_user_created_id_idx" ON "Logs" (user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS "Logs_created_completed_idx" ON "Logs" (created_at, is_completed);
+
+CREATE TABLE IF NOT EXISTS "Logs_Idempotency" (
+    idempotency_key TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f+00:00', 'now'))
+);
+
+-- Rollup diario por agente (Inicio > Performance Tracker)
+CREATE TABLE IF NOT EXISTS "Agent_Daily_Stats" (
+    user_id INTEGER NOT NULL REFERENCES "Users"(id),
+    day_et TEXT NOT NULL,
+    result TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    is_completed BOOLEAN
+        GENERATED ALWAYS AS (result LIKE '%completed%' AND result NOT LIKE '%not%') STORED,
+    result_reason TEXT
+        GENERATED ALWAYS AS (
+            CASE WHEN result LIKE '%completed%' AND result NOT LIKE '%not%' THEN NULL
+                 WHEN ltrim(result) LIKE 'not completed%' AND ltrim(substr(ltrim(result), 14)) LIKE '-%'
+                     THEN trim(substr(ltrim(substr(ltrim(result), 14)), 2))
+                 ELSE trim(result)
+            END
+        ) STORED,
+    PRIMARY KEY (user_id, day_et, result)
+);
+
+-- Tabla de Noticias (Updates)
+CREATE TABLE IF NOT EXISTS "Updates" (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    title TEXT NOT NULL,
+    message TEXT NOT NULL,
+    category TEXT NOT NULL, -- 'Info', 'Warning', 'Critical'
+    active BOOLEAN DEFAULT TRUE,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f+00:00', 'now'))
+);
+CREATE INDEX IF NOT EXISTS "Updates_active_date_idx" ON "Updates" (active, date DESC);
+
+CREATE TABLE IF NOT EXISTS "Updates_Reads" (
+    update_id INT REFERENCES "Updates"(id) ON DELETE CASCADE,
+    username TEXT NOT NULL,
+    read_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f+00:00', 'now')),
+    PRIMARY KEY (update_id, username)
+);
+
+-- Códigos no encontrados reportados desde el Buscador
+CREATE TABLE IF NOT EXISTS "Search_Misses" (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    abreviation TEXT NOT NULL,
+    cordoba_id TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f+00:00', 'now'))
+);
+
+-- Presencia del staff: una fila por usuario, la escribe presence_service en lotes
+CREATE TABLE IF NOT EXISTS "User_Presence" (
+    username TEXT PRIMARY KEY,
+    user_id INTEGER REFERENCES "Users"(id) ON DELETE CASCADE,
+    view TEXT,
+    last_seen TEXT NOT NULL,
+    last_active TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS "User_Presence_last_seen_idx" ON "User_Presence" (last_seen);
+
+-- updated_at en tablas mutables (equivalente al trigger set_updated_at de init.sql)
+CREATE INDEX IF NOT EXISTS "Users_updated_at_idx" ON "Users" (updated_at, id);
+CREATE INDEX IF NOT EXISTS "Creditors_updated_at_idx" ON "Creditors" (updated_at, id);
+CREATE INDEX IF NOT EXISTS "Affiliates_updated_at_idx" ON "Affiliates" (updated_at, id);
+CREATE INDEX IF NOT EXISTS "Updates_updated_at_idx" ON "Updates" (updated_at, id);
+
+CREATE TRIGGER IF NOT EXISTS "Users_set_updated_at" AFTER UPDATE ON "Users"
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE "Users" SET updated_at = strftime('%Y-%m-%d %H:%M:%f+00:00', 'now') WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS "Creditors_set_updated_at" AFTER UPDATE ON "Creditors"
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE "Creditors" SET updated_at = strftime('%Y-%m-%d %H:%M:%f+00:00', 'now') WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS "Affiliates_set_updated_at" AFTER UPDATE ON "Affiliates"
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE "Affiliates" SET updated_at = strftime('%Y-%m-%d %H:%M:%f+00:00', 'now') WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS "Updates_set_updated_at" AFTER UPDATE ON "Updates"
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE "Updates" SET updated_at = strftime('%Y-%m-%d %H:%M:%f+00:00', 'now') WHERE id = NEW.id;
+END;
+
+-- Novedades: texto completo (equivalente al tsvector 'simple' + GIN de init.sql).
+-- Tabla FTS5 de contenido externo, sincronizada con triggers.
+CREATE VIRTUAL TABLE IF NOT EXISTS "Updates_fts" USING fts5(
+    title, message, content='Updates', content_rowid='id', tokenize='unicode61 remove_diacritics 0'
+);
+CREATE TRIGGER IF NOT EXISTS "Updates_fts_ai" AFTER INSERT ON "Updates" BEGIN
+    INSERT INTO "Updates_fts" (rowid, title, message) VALUES (NEW.id, NEW.title, NEW.message);
+END;
+CREATE TRIGGER IF NOT EXISTS "Updates_fts_ad" AFTER DELETE ON "Updates" BEGIN
+    INSERT INTO "Updates_fts" ("Updates_fts", rowid, title, message) VALUES ('delete', OLD.id, OLD.title, OLD.message);
+END;
+CREATE TRIGGER IF NOT EXISTS "Updates_fts_au" AFTER UPDATE OF title, message ON "Updates" BEGIN
+    INSERT INTO "Updates_fts" ("Updates_fts", rowid, title, message) VALUES ('delete', OLD.id, OLD.title, OLD.message);
+    INSERT INTO "Updates_fts" (rowid, title, message) VALUES (NEW.id, NEW.title, NEW.message);
+END;
+
+-- USUARIO ADMIN POR DEFECTO (mismo hash de prueba que init.sql)
+INSERT INTO "Users" (username, name, password, role)
+VALUES ('admin', 'System Administrator', '$2b$12$VTtjK6Vlk4kAqWpvjF/SXu5suttIRYDE7vCx/WX9FudVWpUa6yZbi', 'Admin')
+ON CONFLICT (username) DO NOTHING;
+
+INSERT INTO "Affiliates" (name) VALUES ('Patriot'), ('Cordoba Legal'), ('Titan') ON CONFLICT DO NOTHING;
@@ -9,6 +9,10 @@ try:
     import services.auth_service as auth_service
     # NUEVO: Importamos el servicio de updates para la alarma
     import services.updates_service as updates_service
+    import services.metrics_service as metrics_service
+    import services.profiler_service as profiler_service
+    import services.presence_service as presence_service
+    import services.maintenance_service as maintenance_service
     
     # VISTAS
     from vistas import login, buscador, updates, inicio, notas, perfil, admin_panel, lab_parser
@@ -28,6 +32,12 @@ st.set_page_config(
 # Cargar CSS
 estilos.cargar_css()
 
+# Endpoint de métricas Prometheus (una vez por proceso)
+metrics_service.start_exporter()
+
+# Mantenimiento de Logs en segundo plano: particiones, archivo, limpieza y snapshot (una vez por proceso)
+maintenance_service.start_scheduler(get_db_connection())
+
 # --- 3. Inicialización de Estado ---
 if "logged_in" not in st.session_state:
     st.session_state.update({
@@ -68,23 +78,37 @@ def intentar_reconexion():
             })
             st.rerun()
 
-# --- 5. Main Loop ---
+# --- 5. Presencia (Staff Online) ---
+@st.fragment(run_every=presence_service.HEARTBEAT_SECONDS)
+def latido_presencia(view: str):
+    """Latido de fondo mientras la pestaña está abierta: solo re-ejecuta este fragmento."""
+    presence_service.heartbeat(
+        get_db_connection(), st.session_state.get("username"),
+        st.session_state.get("user_id"), view, active=False
+    )
+
+# --- 6. Main Loop ---
 def main():
     intentar_reconexion()
 
     # Si no está logueado, mostrar Login
     if not st.session_state.logged_in:
-        login.show(cookie_manager)
+        profiler_service.label_rerun("login")
+        with metrics_service.track_rerun("login"):
+            login.show(cookie_manager)
         return
 
     # =======================================================
     # 🚨 SISTEMA DE ALARMA GLOBAL (INYECCIÓN)
     # =======================================================
+    st.session_state.pop(updates_service.RERUN_UPDATES_KEY, None)
     try:
         conn = get_db_connection()
-        # 1. Traer noticias y leídos
+        # 1. Traer noticias; los leídos vienen del set de la sesión (se actualiza en memoria al marcar)
         df_upd = updates_service.fetch_updates(conn)
-        reads = updates_service.fetch_read_ids(conn, st.session_state.username)
+        # La vista Novedades reutiliza este mismo resultado (una sola consulta por rerun)
+        st.session_state[updates_service.RERUN_UPDATES_KEY] = df_upd
+        reads = updates_service.session_read_ids(conn, st.session_state.username, st.session_state)
         
         # 2. Filtrar CUALQUIER mensaje no leído
         if not df_upd.empty:
@@ -154,6 +178,7 @@ def main():
         st.markdown("---")
         
         if st.button("🚪 Cerrar Sesión", use_container_width=True):
+            presence_service.sign_out(get_db_connection(), st.session_state.username)
             cookie_manager.delete("cordoba_user")
             st.session_state.clear()
             st.rerun()
@@ -163,7 +188,15 @@ def main():
         if opcion == "🎛️ Admin Panel" and st.session_state.role != "Admin":
             st.error("⛔ Acceso Denegado.")
         else:
-            rutas[opcion].show()
+            view = rutas[opcion].__name__.split(".")[-1]
+            profiler_service.label_rerun(view)
+            # Rerun completo = interacción del usuario (en memoria; a la BD como mucho cada 30s)
+            presence_service.heartbeat(get_db_connection(), st.session_state.username, st.session_state.user_id, view)
+            with metrics_service.track_rerun(view):
+                rutas[opcion].show()
+            latido_presencia(view)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Opt-in (APP_PROFILING=1 o Admin Panel > Rendimiento): no-op si está apagado
+    with profiler_service.profile_rerun(st.session_state.get("username")):
+        main()
\ No newline at end of file
@@ -1,8 +1,22 @@
 import bcrypt
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
 from sqlalchemy import text
 
+import services.stats_service as stats_service
+import services.kpi_service as kpi_service
+import services.archive_service as archive_service
+import services.metrics_service as metrics_service
+import services.report_service as report_service
+import services.snapshot_service as snapshot_service
+import services.storage as storage
+import services.user_directory as user_directory
+from services.records import (
+    LOG_EXPORT_COLUMNS, LOG_EDITOR_COLUMNS, CREDITOR_COLUMNS,
+    SEARCH_MISS_COLUMNS, UPDATE_COLUMNS,
+    LogEditorRecord, CreditorRecord, select_list, apply_dtypes, to_records
+)
+
 # --- Helpers ---
 
 def run_transaction(conn, query_str: str, params: dict = None):
@@ -18,19 +32,18 @@ def run_transaction(conn, query_str: str, params: dict = None):
 
 # --- Dashboard & KPIs ---
 
-def fetch_global_kpis(conn):
-    if not conn: return 0, pd.DataFrame()
+def fetch_total_creditors(conn) -> int:
+    if not conn: return 0
     try:
-        df_count = conn.query('SELECT COUNT(*) as total FROM "Creditors"', ttl=0)
-        total_bancos = df_count.iloc[0]['total'] if not df_count.empty else 0
-        
-        yesterday_utc = (datetime.utcnow() - timedelta(days=2)).strftime('%Y-%m-%d %H:%M:%S')
-        logs_query = 'SELECT * FROM "Logs" WHERE created_at >= :yesterday AND agent != \'test\''
-        df_logs = conn.query(logs_query, params={"yesterday": yesterday_utc}, ttl=0)
-            
-        return total_bancos, df_logs
+        with metrics_service.cache_lookup("creditors_count"):
+            df_count = conn.query('SELECT COUNT(*) as total FROM "Creditors"', ttl=60)
+        return int(df_count.iloc[0]['total']) if not df_count.empty else 0
     except Exception as e:
-        return 0, pd.DataFrame()
+        return 0
+
+def fetch_today_kpis(conn):
+    """KPIs de hoy (ET) desde el acumulador incremental de services/kpi_service."""
+    return kpi_service.get_today_kpis(conn)
 
 def fetch_live_feed(conn, limit=15):
     """Obtiene los registros más recientes con Nombres Reales y Cordoba ID."""
@@ -63,45 +76,79 @@ def fetch_live_feed(conn, limit=15):
     return pd.DataFrame()
 
 def fetch_agent_list(conn):
-    try:
-        df = conn.query('SELECT username FROM "Users" WHERE active = TRUE ORDER BY username', ttl=60)
-        return df['username'].tolist()
-    except:
-        return []
+    """Usernames activos (directorio de usuarios en memoria)."""
+    return user_directory.agent_list(conn)
 
 def fetch_user_map(conn):
-    try:
-        df = conn.query('SELECT username, name FROM "Users"', ttl=600)
-        return pd.Series(df.name.values, index=df.username).to_dict()
-    except:
-        return {}
-
-def fetch_logs_for_export(conn, start_date, end_date, target_agent):
-    base_query = """
-        SELECT * FROM "Logs" 
-        WHERE created_at >= :start AND created_at <= :end
-    """
+    """{username: nombre} (directorio de usuarios en memoria)."""
+    return user_directory.user_map(conn)
+
+def _export_filters(conn, start_date, end_date, target_agent):
+    where = "created_at >= :start AND created_at <= :end"
     params = {
         "start": f"{start_date} 00:00:00",
         "end": f"{end_date} 23:59:59"
     }
     
     if "TODOS" not in target_agent:
-        base_query += " AND agent ILIKE :target"
+        where += " AND " + storage.backend(conn).ilike("agent", ":target")
         params["target"] = target_agent
     else:
-        base_query += " AND agent != 'test'"
-    
-    return conn.query(base_query + " ORDER BY created_at DESC", params=params, ttl=0)
+        where += " AND agent != 'test'"
+    return where, params
+
+def count_logs_for_export(conn, start_date, end_date, target_agent) -> int:
+    """Total de filas del rango (Postgres + meses archivados). Va directo al engine: se llama desde los workers de reportes."""
+    where, params = _export_filters(conn, start_date, end_date, target_agent)
+    with conn.engine.connect() as db:
+        live = int(db.execute(text(f'SELECT COUNT(*) FROM "Logs" WHERE {where}'), params).scalar() or 0)
+    return live + archive_service.count_archived_logs(start_date, end_date, target_agent)
+
+def iter_logs_for_export(conn, start_date, end_date, target_agent, order_by="created_at DESC", chunksize=5000):
+    """
+    Recorre el rango con un cursor del lado del servidor (stream_results) en bloques de
+    `chunksize` filas: la memoria no crece con el tamaño del rango exportado.
+    `order_by` es un fragmento SQL fijo elegido por el motor de reportes (no input de usuario).
+    Los meses ya archivados a Parquet se leen a continuación (son más viejos que todo lo vivo).
+    """
+    where, params = _export_filters(conn, start_date, end_date, target_agent)
+    sql = f'SELECT {select_list(LOG_EXPORT_COLUMNS)} FROM "Logs" WHERE {where} ORDER BY {order_by}'
+    with conn.engine.connect().execution_options(stream_results=True) as db:
+        for chunk in pd.read_sql(text(sql), db, params=params, chunksize=chunksize):
+            # Rango vacío: read_sql entrega un bloque vacío y sin dtypes (el reporte queda "empty")
+            if chunk.empty: continue
+            yield apply_dtypes(chunk)
+    yield from archive_service.iter_archived_logs(
+        start_date, end_date, target_agent, LOG_EXPORT_COLUMNS, order_by=order_by, chunksize=chunksize
+    )
 
 # --- Gestión de Logs (Quirófano) ---
 
 def fetch_log_by_cordoba_id(conn, cordoba_id):
-    return conn.query('SELECT * FROM "Logs" WHERE cordoba_id = :cid', params={"cid": cordoba_id}, ttl=0)
+    """Nota más reciente del ID Córdoba (LogEditorRecord) o None."""
+    sql = f'SELECT {select_list(LOG_EDITOR_COLUMNS)} FROM "Logs" WHERE cordoba_id = :cid ORDER BY created_at DESC LIMIT 1'
+    records = to_records(conn.query(sql, params={"cid": cordoba_id}, ttl=0), LogEditorRecord)
+    return records[0] if records else None
 
 def update_log_entry(conn, log_id, new_result, new_comments):
-    sql = 'UPDATE "Logs" SET result = :res, comments = :comm WHERE id = :id'
-    return run_transaction(conn, sql, {"res": new_result, "comm": new_comments, "id": log_id})
+    sql = 'UPDATE "Logs" SET result = :res, comments = :comm WHERE id = :id RETURNING created_at'
+    try:
+        with conn.session as session:
+            created_at = session.execute(text(sql), {"res": new_result, "comm": new_comments, "id": log_id}).scalar()
+            # El resultado pudo cambiar: recalculamos el rollup de ese agente/día
+            stats_service.refresh_log_day(session, log_id)
+            session.commit()
+        kpi_service.invalidate()
+        if created_at is not None:
+            # Los reportes cerrados en caché y el mes del snapshot con ese día ya no valen
+            # (mismo criterio UTC del exporte)
+            day = pd.to_datetime(created_at, utc=True).date()
+            report_service.drop_closed_reports(day)
+            snapshot_service.mark_stale(day)
+        return True
+    except Exception as e:
+        print(f"Transaction Error: {e}")
+        return False
 
 # --- Gestión de Bancos (Creditors) ---
 
@@ -109,14 +156,50 @@ def create_creditor(conn, name, abbreviation):
     sql = 'INSERT INTO "Creditors" (name, abreviation) VALUES (:name, :abbr)'
     return run_transaction(conn, sql, {"name": name, "abbr": abbreviation})
 
-def search_creditors(conn, search_term):
-    sql = """
-        SELECT * FROM "Creditors" 
-        WHERE name ILIKE :q OR abreviation ILIKE :q 
-        ORDER BY name ASC 
-        LIMIT 5000
+CREDITOR_PAGE_SIZE = 10
+
+def _escape_like(term: str) -> str:
+    """Escapa comodines de LIKE para que '%' o '_' tecleados se busquen literales."""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def search_creditors(conn, search_term, page=1, page_size=CREDITOR_PAGE_SIZE):
+    """
+    Una página de acreedores que coinciden con `search_term` + total de coincidencias.
+    Orden por relevancia: código exacto, código que empieza igual, nombre que empieza igual, resto.
+    Usa los índices trigram de init.sql (en SQLite, LIKE sobre la tabla); nunca trae la tabla completa.
+    Retorna (lista de CreditorRecord, total).
     """
-    return conn.query(sql, params={"q": f"%{search_term}%"}, ttl=0)
+    term = (search_term or "").strip()
+    if not term: return [], 0
+
+    like = _escape_like(term)
+    ilike = storage.backend(conn).ilike
+    sql = f"""
+        SELECT {select_list(CREDITOR_COLUMNS)}, COUNT(*) OVER () AS total_count
+        FROM "Creditors"
+        WHERE {ilike("name", ":contains")} OR {ilike("abreviation", ":contains")}
+        ORDER BY
+            CASE
+                WHEN upper(abreviation) = upper(:term) THEN 0
+                WHEN {ilike("abreviation", ":prefix")} THEN 1
+                WHEN {ilike("name", ":prefix")} THEN 2
+                ELSE 3
+            END,
+            abreviation, name, id
+        LIMIT :limit OFFSET :offset
+    """
+    page = max(int(page), 1)
+    params = {"term": term, "contains": f"%{like}%", "prefix": f"{like}%", "limit": page_size, "offset": (page - 1) * page_size}
+    try:
+        df = conn.query(sql, params=params, ttl=0)
+        if df.empty and page > 1:
+            # Página fuera de rango (la tabla cambió): volvemos a la primera
+            return search_creditors(conn, term, 1, page_size)
+        total = int(df.iloc[0]['total_count']) if not df.empty else 0
+        return to_records(df, CreditorRecord), total
+    except Exception as e:
+        print(f"Creditor Search Error: {e}")
+        return [], 0
     
 def update_creditor(conn, creditor_id, name, abbreviation):
     sql = 'UPDATE "Creditors" SET name = :n, abreviation = :a WHERE id = :id'
@@ -130,7 +213,7 @@ def delete_creditor(conn, creditor_id):
 def fetch_search_misses(conn):
     """Obtiene la lista de bancos no encontrados reportados por agentes."""
     try:
-        return conn.query('SELECT * FROM "Search_Misses" ORDER BY created_at DESC', ttl=0)
+        return conn.query(f'SELECT {select_list(SEARCH_MISS_COLUMNS)} FROM "Search_Misses" ORDER BY created_at DESC', ttl=0)
     except Exception:
         return pd.DataFrame()
 
@@ -148,16 +231,35 @@ def create_update(conn, title, message, category):
     params = {"date": datetime.now().strftime('%Y-%m-%d'), "tit": title, "msg": message, "cat": category}
     return run_transaction(conn, sql, params)
 
-def fetch_active_updates(conn):
-    return conn.query('SELECT * FROM "Updates" WHERE active = TRUE ORDER BY date DESC', ttl=0)
-
 def archive_update(conn, update_id):
     return run_transaction(conn, 'UPDATE "Updates" SET active = FALSE WHERE id = :id', {"id": update_id})
 
 # --- NUEVO: Auditoría de Lectura de Noticias ---
 
+def fetch_update_read_stats(conn):
+    """
+    Noticias activas con su conteo de lecturas y el total de agentes activos, en una sola
+    consulta (antes: una consulta por noticia + otra para el total).
+    """
+    sql = f"""
+        SELECT {select_list(UPDATE_COLUMNS, "N")},
+               COUNT(U.username) AS read_count,
+               (SELECT COUNT(*) FROM "Users" WHERE active = TRUE AND role != 'Admin') AS total_agents
+        FROM "Updates" N
+        LEFT JOIN "Updates_Reads" R ON R.update_id = N.id
+        LEFT JOIN "Users" U ON U.username = R.username
+        WHERE N.active = TRUE
+        GROUP BY N.id
+        ORDER BY N.date DESC
+    """
+    try:
+        return conn.query(sql, ttl=0)
+    except Exception as e:
+        print(f"Read Stats Error: {e}")
+        return pd.DataFrame()
+
 def fetch_update_reads(conn, update_id):
-    """Obtiene quiénes leyeron una noticia específica."""
+    """Obtiene quiénes leyeron una noticia específica (solo al abrir el detalle)."""
     try:
         # Hacemos JOIN para mostrar Nombre Real en vez de username
         sql = """
@@ -175,14 +277,6 @@ def fetch_update_reads(conn, update_id):
     except Exception:
         return pd.DataFrame()
 
-def get_total_active_agents(conn):
-    """Cuenta total de agentes activos para calcular porcentaje de lectura."""
-    try:
-        df = conn.query("SELECT COUNT(*) as count FROM \"Users\" WHERE active = TRUE AND role != 'Admin'", ttl=300)
-        return df.iloc[0]['count']
-    except:
-        return 1
-
 # --- Gestión de Usuarios ---
 
 def create_user(conn, username, name, password, role):
@@ -191,10 +285,14 @@ def create_user(conn, username, name, password, role):
         INSERT INTO "Users" (username, name, password, role, active) 
         VALUES (:u, :n, :p, :r, TRUE)
     """
-    return run_transaction(conn, sql, {"u": username, "n": name, "p": hashed, "r": role})
+    ok = run_transaction(conn, sql, {"u": username, "n": name, "p": hashed, "r": role})
+    if ok:
+        user_directory.refresh_user(conn, username=username)
+    return ok
 
 def fetch_all_users(conn):
-    return conn.query('SELECT * FROM "Users" ORDER BY username', ttl=0)
+    """Lista de UserRecord (sin hash de contraseña), desde el directorio en memoria."""
+    return user_directory.all_users(conn)
 
 def update_user_profile(conn, user_id, name, role, active, new_password=None):
     sql = 'UPDATE "Users" SET name = :n, role = :r, active = :a'
@@ -206,4 +304,7 @@ def update_user_profile(conn, user_id, name, role, active, new_password=None):
         params["p"] = hashed
     
     sql += ' WHERE id = :id'
-    return run_transaction(conn, sql, params)
\ No newline at end of file
+    ok = run_transaction(conn, sql, params)
+    if ok:
+        user_directory.refresh_user(conn, user_id=user_id)
+    return ok
\ No newline at end of file
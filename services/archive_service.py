@@ -0,0 +1,246 @@
+import os
+import re
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from datetime import date, datetime, timedelta
+import pytz
+from sqlalchemy import text
+
+from services.records import apply_dtypes
+
+# ==============================================================================
+# PARTICIONES DE LOGS + ARCHIVO FRÍO EN PARQUET
+# Pasos del job de mantenimiento (services/maintenance_service):
+#   - Crea por adelantado los meses que faltan ("Logs_YYYY_MM") y saca de "Logs_default"
+#     las filas que hayan caído ahí (solo Postgres).
+#   - Meses más viejos que la retención -> Parquet comprimido en disco + DETACH/DROP.
+#   - Limpia claves de idempotencia vencidas.
+# Los exportes leen los meses archivados de forma transparente (iter_archived_logs).
+# ==============================================================================
+
+# --- Configuración ---
+
+ARCHIVE_DIR = os.getenv("LOGS_ARCHIVE_DIR", os.path.join("data", "logs_archive"))
+
+# Meses que se quedan en Postgres (además del actual)
+RETENTION_MONTHS = int(os.getenv("LOGS_RETENTION_MONTHS", "18"))
+
+MONTHS_AHEAD = 3
+
+IDEMPOTENCY_KEY_TTL = timedelta(days=1)
+
+PARTITION_RE = re.compile(r'^Logs_(\d{4})_(\d{2})$')
+
+# Parquet confirmado en la BD pero aún sin renombrar (ver archive_old_partitions)
+ARCHIVE_PART_RE = re.compile(r'^logs_(\d{4})_(\d{2})\.parquet\.part$')
+
+# Esquema fijo del archivo: todos los meses comparten tipos (sin inferencia por bloque)
+ARCHIVE_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("created_at", pa.timestamp("us", tz="UTC")),
+    ("user_id", pa.int64()),
+    ("agent", pa.string()),
+    ("cordoba_id", pa.string()),
+    ("result", pa.string()),
+    ("is_completed", pa.bool_()),
+    ("result_reason", pa.string()),
+    ("comments", pa.string()),
+    ("affiliate", pa.string()),
+    ("info_until", pa.string()),
+    ("client_language", pa.string()),
+    ("transfer_status", pa.string()),
+])
+
+# --- SQL ---
+
+SQL_ENSURE_PARTITIONS = "SELECT ensure_logs_partitions((date_trunc('month', now() AT TIME ZONE 'UTC'))::date, :ahead)"
+
+SQL_LIST_PARTITIONS = """
+    SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = '"Logs"'::regclass
+"""
+
+SQL_PRUNE_IDEMPOTENCY = 'DELETE FROM "Logs_Idempotency" WHERE created_at < :cutoff'
+
+# --- Helpers ---
+
+def month_start(d) -> date:
+    return date(d.year, d.month, 1)
+
+def add_months(d: date, n: int) -> date:
+    total = d.year * 12 + d.month - 1 + n
+    return date(total // 12, total % 12 + 1, 1)
+
+def archive_path(month: date) -> str:
+    return os.path.join(ARCHIVE_DIR, f"logs_{month:%Y_%m}.parquet")
+
+def _list_partitions(db) -> dict:
+    """{mes: nombre_de_tabla} de las particiones mensuales adjuntas."""
+    months = {}
+    for (name,) in db.execute(text(SQL_LIST_PARTITIONS)):
+        m = PARTITION_RE.match(name)
+        if m:
+            months[date(int(m.group(1)), int(m.group(2)), 1)] = name
+    return months
+
+def _write_partition(db, table_name: str, path: str, chunksize: int = 50000) -> int:
+    """Vuelca una partición a Parquet (zstd) por bloques. Retorna filas escritas."""
+    cols = ", ".join(f'"{c}"' for c in ARCHIVE_SCHEMA.names)
+    sql = f'SELECT {cols} FROM "{table_name}" ORDER BY created_at, id'
+    rows = 0
+    with pq.ParquetWriter(path, ARCHIVE_SCHEMA, compression="zstd") as writer:
+        for chunk in pd.read_sql(text(sql).execution_options(stream_results=True), db, chunksize=chunksize):
+            chunk['created_at'] = pd.to_datetime(chunk['created_at'], utc=True)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=ARCHIVE_SCHEMA, preserve_index=False))
+            rows += len(chunk)
+    return rows
+
+# --- Mantenimiento ---
+
+def ensure_partitions(conn, months_ahead: int = MONTHS_AHEAD) -> int:
+    """Crea los meses faltantes hasta `months_ahead` meses adelante. Retorna cuántos creó."""
+    with conn.engine.begin() as db:
+        return int(db.execute(text(SQL_ENSURE_PARTITIONS), {"ahead": months_ahead}).scalar() or 0)
+
+def archive_old_partitions(conn, keep_months: int = RETENTION_MONTHS) -> list:
+    """
+    Archiva los meses anteriores a la retención: Parquet -> DETACH -> DROP en una transacción
+    por mes (la partición se bloquea contra escrituras mientras se vuelca).
+    El archivo se publica (rename) solo si la transacción confirma. Retorna los meses archivados.
+    """
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    cutoff = add_months(month_start(datetime.utcnow()), -keep_months)
+    archived = []
+
+    with conn.engine.connect() as db:
+        partitions = _list_partitions(db)
+    _publish_pending(partitions)
+
+    for month, table_name in sorted(partitions.items()):
+        if month >= cutoff: continue
+        final_path = archive_path(month)
+        part_path = final_path + ".part"
+        try:
+            with conn.engine.begin() as db:
+                db.execute(text(f'LOCK TABLE "{table_name}" IN SHARE MODE'))
+                rows = _write_partition(db, table_name, part_path)
+                db.execute(text(f'ALTER TABLE "Logs" DETACH PARTITION "{table_name}"'))
+                db.execute(text(f'DROP TABLE "{table_name}"'))
+        except Exception as e:
+            # Sin confirmar: la partición sigue en la BD y el .part se descarta
+            print(f"[Archive Error] {table_name}: {e}")
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            continue
+        # Confirmado: el .part es la única copia del mes, nunca se borra
+        if _publish(part_path, final_path):
+            archived.append(month)
+            print(f"[Archive] {table_name}: {rows} filas -> {final_path}")
+    return archived
+
+def _publish(part_path: str, final_path: str) -> bool:
+    try:
+        os.replace(part_path, final_path)
+        return True
+    except OSError as e:
+        print(f"[Archive Error] {part_path} sin publicar (se reintenta en la próxima corrida): {e}")
+        return False
+
+def _publish_pending(partitions: dict):
+    """Publica los .part de meses ya quitados de la BD (rename fallido en una corrida anterior)."""
+    for name in os.listdir(ARCHIVE_DIR):
+        m = ARCHIVE_PART_RE.match(name)
+        if not m: continue
+        month = date(int(m.group(1)), int(m.group(2)), 1)
+        final_path = archive_path(month)
+        if month not in partitions and not os.path.exists(final_path):
+            _publish(os.path.join(ARCHIVE_DIR, name), final_path)
+
+def prune_idempotency_keys(conn) -> int:
+    with conn.engine.begin() as db:
+        return db.execute(text(SQL_PRUNE_IDEMPOTENCY), {"cutoff": datetime.now(pytz.utc) - IDEMPOTENCY_KEY_TTL}).rowcount
+
+# --- Lectura de Meses Archivados ---
+
+def _archived_files(start_date, end_date) -> list:
+    """Archivos Parquet de los meses que tocan el rango, del más reciente al más viejo."""
+    files, month = [], month_start(end_date)
+    first = month_start(start_date)
+    while month >= first:
+        path = archive_path(month)
+        if os.path.exists(path):
+            files.append(path)
+        month = add_months(month, -1)
+    return files
+
+def export_filter_expr(start_date, end_date, target_agent):
+    """Mismos filtros que admin_service._export_filters, como expresión de pyarrow (pushdown)."""
+    expr = (ds.field("created_at") >= pd.Timestamp(f"{start_date} 00:00:00", tz="UTC")) & \
+           (ds.field("created_at") <= pd.Timestamp(f"{end_date} 23:59:59", tz="UTC"))
+    if "TODOS" not in target_agent:
+        expr &= pc.utf8_lower(_agent_field()) == str(target_agent).lower()
+    else:
+        expr &= _agent_field() != "test"
+    return expr
+
+def _agent_field():
+    """agent como texto: en el snapshot es diccionario y utf8_lower no acepta diccionarios."""
+    return ds.field("agent").cast(pa.string())
+
+def count_archived_logs(start_date, end_date, target_agent) -> int:
+    files = _archived_files(start_date, end_date)
+    if not files: return 0
+    expr = export_filter_expr(start_date, end_date, target_agent)
+    return sum(ds.dataset(path, format="parquet").count_rows(filter=expr) for path in files)
+
+def _row_groups_desc(path: str, expr) -> list:
+    """Row groups del archivo que pueden tener filas de `expr` (poda por estadísticas), del último al primero."""
+    groups = []
+    for fragment in ds.dataset(path, format="parquet").get_fragments(filter=expr):
+        groups.extend(fragment.split_by_row_group(filter=expr))
+    return groups[::-1]
+
+def _read_desc(path: str, expr, columns: list, chunksize: int):
+    """
+    Filas de un archivo escrito en orden (created_at, id), de la más nueva a la más vieja.
+    Lee un row group a la vez (un bloque de escritura, <= 50000 filas): memoria acotada.
+    """
+    for group in _row_groups_desc(path, expr):
+        table = group.to_table(columns=columns, filter=expr)
+        if table.num_rows == 0: continue
+        df = table.to_pandas().iloc[::-1]
+        for i in range(0, len(df), chunksize):
+            yield apply_dtypes(df.iloc[i:i + chunksize].copy())
+
+def _agents_in(paths: list, expr) -> list:
+    """Agentes distintos de los archivos que pasan `expr`, en el orden de lower(agent), agent."""
+    found = set()
+    for batch in ds.dataset(paths, format="parquet").to_batches(columns=["agent"], filter=expr):
+        found.update(pc.unique(batch.column(0).cast(pa.string())).to_pylist())
+    found.discard(None)
+    return sorted(found, key=lambda ag: (ag.lower(), ag))
+
+def iter_parquet_logs(paths, expr, columns, order_by="created_at DESC", chunksize=5000):
+    """
+    Bloques de DataFrame (mismas columnas y dtypes que el exporte desde Postgres) de archivos
+    mensuales escritos en orden (created_at, id); `paths` va del mes más nuevo al más viejo.
+    Orden por agente (Operativo): por cada agente, una pasada filtrada sobre los meses. La
+    memoria sigue acotada a un row group a costa de releer los archivos una vez por agente.
+    """
+    columns, paths = list(columns), list(paths)
+    if not paths: return
+    if "agent" in order_by:
+        for ag in _agents_in(paths, expr):
+            for path in paths:
+                yield from _read_desc(path, expr & (_agent_field() == ag), columns, chunksize)
+    else:
+        for path in paths:
+            yield from _read_desc(path, expr, columns, chunksize)
+
+def iter_archived_logs(start_date, end_date, target_agent, columns, order_by="created_at DESC", chunksize=5000):
+    """Meses archivados del rango, mes por mes (el más reciente primero), en bloques acotados."""
+    expr = export_filter_expr(start_date, end_date, target_agent)
+    yield from iter_parquet_logs(_archived_files(start_date, end_date), expr, columns, order_by, chunksize)
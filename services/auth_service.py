@@ -2,14 +2,16 @@ import bcrypt
 from sqlalchemy import text
 import pandas as pd
 
+import services.user_directory as user_directory
+
 def login_user(conn, username, password):
-    """Verifica credenciales. Retorna dict usuario o None."""
+    """Verifica credenciales. Retorna dict usuario (sin hash) o None."""
     if not conn: return None
     try:
-        user = get_user_by_username(conn, username)
+        user = user_directory.auth_for(conn, username)
         if not user: return None
 
-        stored_hash = user['password']
+        stored_hash = user.pop('password')
         if bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8')):
             return user
         return None
@@ -18,23 +20,15 @@ def login_user(conn, username, password):
         return None
 
 def get_user_by_username(conn, username):
-    """Busca un usuario por username sin validar password (para cookies)."""
+    """Busca un usuario por username sin validar password (para cookies). Sale del directorio en memoria, sin hash."""
     if not conn: return None
-    try:
-        query = 'SELECT * FROM "Users" WHERE username = :u'
-        df = conn.query(query, params={"u": username}, ttl=0)
-        
-        if df.empty: return None
-        return df.iloc[0].to_dict() # Retornamos diccionario para consistencia
-    except Exception as e:
-        print(f"User Fetch Error: {e}")
-        return None
+    return user_directory.get_user(conn, username)
 
 def update_credentials(conn, username, current_pass, new_pass):
     """Actualiza la contraseña."""
     if not conn: return False, "DB offline"
     try:
-        user = get_user_by_username(conn, username)
+        user = user_directory.auth_for(conn, username)
         if not user: return False, "Usuario no encontrado"
             
         stored_hash = user['password']
@@ -50,6 +44,7 @@ def update_credentials(conn, username, current_pass, new_pass):
                 {"p": new_hash, "u": username}
             )
             s.commit()
+        user_directory.refresh_user(conn, username=username)
             
         return True, "Contraseña actualizada correctamente"
     except Exception as e:
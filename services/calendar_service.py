@@ -0,0 +1,125 @@
+import bisect
+import numpy as np
+import pandas as pd
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+# --- Configuración ---
+
+# Ventana precalculada de días hábiles (fuera de ella se cae al cálculo día a día)
+WINDOW_START_YEAR = 2020
+WINDOW_END_YEAR = 2040
+
+# Feriados observados, como reglas (no fechas fijas) para que sirvan cualquier año.
+# ("fixed", mes, día) | ("nth", mes, weekday, n)  (n = -1 -> último del mes)
+# Un "fixed" que cae sábado se observa el viernes anterior; en domingo, el lunes siguiente.
+HOLIDAY_RULES = {
+    "New Year's Day": ("fixed", 1, 1),
+    "Memorial Day":   ("nth", 5, 0, -1),   # último lunes de mayo
+    "Labor Day":      ("nth", 9, 0, 1),    # primer lunes de septiembre
+    "Thanksgiving":   ("nth", 11, 3, 4),   # cuarto jueves de noviembre
+    "Christmas Day":  ("fixed", 12, 25),
+}
+
+# Offset entre date.toordinal() y días desde 1970-01-01 (datetime64[D])
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# --- Reglas de Feriados ---
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    if n > 0:
+        first = date(year, month, 1)
+        offset = (weekday - first.weekday()) % 7
+        return first + timedelta(days=offset + 7 * (n - 1))
+    # Último weekday del mes
+    next_month = date(year + (month == 12), month % 12 + 1, 1)
+    last = next_month - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def _observed(day: date) -> date:
+    if day.weekday() == 5: return day - timedelta(days=1)
+    if day.weekday() == 6: return day + timedelta(days=1)
+    return day
+
+@lru_cache(maxsize=64)
+def holidays_for_year(year: int) -> frozenset:
+    """Fechas feriadas (observadas) de un año generadas desde HOLIDAY_RULES."""
+    days = set()
+    for rule in HOLIDAY_RULES.values():
+        if rule[0] == "fixed":
+            # El del año siguiente puede observarse en este (1/1 en sábado -> 31/12)
+            for y in (year, year + 1):
+                observed = _observed(date(y, rule[1], rule[2]))
+                if observed.year == year:
+                    days.add(observed)
+        else:
+            days.add(_nth_weekday(year, rule[1], rule[2], rule[3]))
+    return frozenset(days)
+
+def is_business_day(day: date) -> bool:
+    return day.weekday() < 5 and day not in holidays_for_year(day.year)
+
+# --- Índice Precalculado (una vez por proceso) ---
+
+def _build_business_days() -> list:
+    current = date(WINDOW_START_YEAR, 1, 1)
+    end = date(WINDOW_END_YEAR, 12, 31)
+    ordinals = []
+    while current <= end:
+        if is_business_day(current):
+            ordinals.append(current.toordinal())
+        current += timedelta(days=1)
+    return ordinals
+
+_BUSINESS_DAYS = _build_business_days()
+_BUSINESS_DAYS_NP = np.array(_BUSINESS_DAYS, dtype=np.int64) - _EPOCH_ORDINAL
+
+# --- API ---
+
+def _walk_business_days(start: date, n: int) -> date:
+    """Fallback fuera de la ventana: cuenta día a día (misma semántica que el índice)."""
+    current, counted = start, 0
+    while True:
+        if is_business_day(current):
+            counted += 1
+            if counted == n:
+                return current
+        current += timedelta(days=1)
+
+@lru_cache(maxsize=1024)
+def nth_business_day(start: date, n: int) -> date:
+    """
+    N-ésimo día hábil contando desde `start` inclusive (si `start` es hábil cuenta como el 1).
+    O(log n) con bisect sobre el índice; cacheado por fecha para todo el proceso.
+    """
+    if n <= 0: return start
+    i = bisect.bisect_left(_BUSINESS_DAYS, start.toordinal()) + n - 1
+    if start.year < WINDOW_START_YEAR or i >= len(_BUSINESS_DAYS):
+        return _walk_business_days(start, n)
+    return date.fromordinal(_BUSINESS_DAYS[i])
+
+def add_business_days(start, n: int):
+    """Igual que nth_business_day, pero acepta datetime y conserva su hora/zona."""
+    if isinstance(start, datetime):
+        target = nth_business_day(start.date(), n)
+        return start + timedelta(days=(target - start.date()).days)
+    return nth_business_day(start, n)
+
+def business_dates_for(dates: pd.Series, n: int, tz: str = 'US/Eastern') -> pd.Series:
+    """
+    Variante vectorizada para un DataFrame de logs: fecha (día ET) del N-ésimo día hábil
+    para cada elemento. Timestamps con zona se convierten a `tz` antes de tomar el día.
+    Fuera de la ventana precalculada devuelve NaT.
+    """
+    ts = pd.to_datetime(dates)
+    if ts.dt.tz is not None:
+        ts = ts.dt.tz_convert(tz).dt.tz_localize(None)
+    days = ts.values.astype('datetime64[D]')
+    if n <= 0:
+        return pd.Series(days, index=dates.index)
+
+    idx = np.searchsorted(_BUSINESS_DAYS_NP, days.astype(np.int64), side='left') + n - 1
+    valid = (idx < len(_BUSINESS_DAYS_NP)) & (days >= np.datetime64(f'{WINDOW_START_YEAR}-01-01'))
+    out = np.full(len(days), np.datetime64('NaT'), dtype='datetime64[D]')
+    out[valid] = _BUSINESS_DAYS_NP[idx[valid]].astype('datetime64[D]')
+    return pd.Series(out, index=dates.index)
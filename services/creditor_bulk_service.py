@@ -0,0 +1,175 @@
+import io
+import csv
+import pandas as pd
+from typing import NamedTuple
+
+import services.storage as storage
+
+# ==============================================================================
+# IMPORTACIÓN / EXPORTACIÓN MASIVA DE ACREEDORES
+# El archivo se normaliza en pandas, se sube con COPY a una tabla temporal y se
+# clasifica/aplica con sentencias set-based (sin un INSERT por fila). Solo Postgres
+# (COPY + regexp_replace); con SQLite la exportación sale por un SELECT normal.
+# ==============================================================================
+
+# --- Configuración ---
+
+# Encabezados aceptados en el archivo -> columna interna
+COLUMN_ALIASES = {
+    "code": "code", "codigo": "code", "código": "code", "abreviation": "code",
+    "abbreviation": "code", "abreviacion": "code", "abreviación": "code", "alias": "code",
+    "name": "name", "nombre": "name", "entidad": "name", "creditor": "name",
+}
+
+# Misma normalización del código que el Buscador (search_service.Normalized_Code)
+SQL_NORMALIZED_CODE = "upper(btrim(regexp_replace(C.abreviation, '\\s+', ' ', 'g')))"
+
+SQL_CREATE_STAGE = """
+    CREATE TEMP TABLE creditor_stage (code TEXT PRIMARY KEY, name TEXT NOT NULL) ON COMMIT DROP
+"""
+
+SQL_COPY_STAGE = "COPY creditor_stage (code, name) FROM STDIN WITH (FORMAT csv)"
+
+SQL_CREATE_PLAN = f"""
+    CREATE TEMP TABLE creditor_plan ON COMMIT DROP AS
+    SELECT S.code, S.name AS new_name, C.id, C.name AS old_name,
+           CASE
+               WHEN COUNT(C.id) OVER (PARTITION BY S.code) = 0 THEN 'insert'
+               WHEN COUNT(C.id) OVER (PARTITION BY S.code) > 1 THEN 'conflict'
+               WHEN C.name = S.name THEN 'unchanged'
+               ELSE 'update'
+           END AS action
+    FROM creditor_stage S
+    LEFT JOIN "Creditors" C ON {SQL_NORMALIZED_CODE} = S.code
+"""
+
+SQL_READ_PLAN = "SELECT code, new_name, id, old_name, action FROM creditor_plan ORDER BY action, code, id"
+
+SQL_APPLY_UPDATES = """
+    UPDATE "Creditors" C SET name = P.new_name
+    FROM creditor_plan P
+    WHERE P.action = 'update' AND C.id = P.id
+"""
+
+SQL_APPLY_INSERTS = """
+    INSERT INTO "Creditors" (name, abreviation)
+    SELECT new_name, code FROM creditor_plan WHERE action = 'insert'
+"""
+
+SQL_COPY_EXPORT = """
+    COPY (SELECT abreviation AS code, name FROM "Creditors" ORDER BY abreviation, name, id)
+    TO STDOUT WITH (FORMAT csv, HEADER)
+"""
+
+class ImportPlan(NamedTuple):
+    inserts: pd.DataFrame     # code, name
+    updates: pd.DataFrame     # id, code, old_name, new_name
+    conflicts: pd.DataFrame   # code, name, reason
+    unchanged: int
+    applied: bool
+
+# --- Lectura y Normalización ---
+
+def read_creditor_file(uploaded_file) -> pd.DataFrame:
+    """CSV o XLSX -> DataFrame(code, name) con textos normalizados. Lanza ValueError si faltan columnas."""
+    filename = getattr(uploaded_file, "name", "").lower()
+    if filename.endswith((".xlsx", ".xls")):
+        raw = pd.read_excel(uploaded_file, dtype=str)
+    else:
+        raw = pd.read_csv(uploaded_file, dtype=str, sep=None, engine="python", encoding="utf-8-sig")
+
+    raw = raw.rename(columns=lambda c: COLUMN_ALIASES.get(str(c).strip().lower(), c))
+    missing = {"code", "name"} - set(raw.columns)
+    if missing:
+        raise ValueError(f"Faltan columnas: {', '.join(sorted(missing))} (se aceptan p.ej. 'code'/'abreviation' y 'name')")
+
+    df = raw[["code", "name"]].copy()
+    df["code"] = df["code"].fillna("").str.strip().str.upper().str.replace(r"\s+", " ", regex=True)
+    df["name"] = df["name"].fillna("").str.strip().str.replace(r"\s+", " ", regex=True)
+    return df
+
+def _dedup(df: pd.DataFrame):
+    """
+    Separa filas válidas de conflictos internos del archivo:
+    sin código / sin nombre, o el mismo código con nombres distintos.
+    """
+    invalid = df[(df["code"] == "") | (df["name"] == "")].assign(reason="Código o nombre vacío")
+    df = df.drop(invalid.index).drop_duplicates()
+
+    dup_mask = df["code"].duplicated(keep=False)
+    dups = df[dup_mask].assign(reason="Código repetido en el archivo con nombres distintos")
+    clean = df[~dup_mask]
+    conflicts = pd.concat([invalid, dups], ignore_index=True)[["code", "name", "reason"]]
+    return clean.reset_index(drop=True), conflicts
+
+# --- Staging + Merge ---
+
+def _copy_stage(cur, df: pd.DataFrame):
+    buf = io.StringIO()
+    df[["code", "name"]].to_csv(buf, index=False, header=False, quoting=csv.QUOTE_MINIMAL)
+    buf.seek(0)
+    cur.execute(SQL_CREATE_STAGE)
+    cur.copy_expert(SQL_COPY_STAGE, buf)
+
+def _read_plan(cur) -> pd.DataFrame:
+    cur.execute(SQL_READ_PLAN)
+    return pd.DataFrame(cur.fetchall(), columns=["code", "new_name", "id", "old_name", "action"])
+
+def plan_import(conn, df: pd.DataFrame, apply: bool = False) -> ImportPlan:
+    """
+    Sube `df` con COPY a una tabla temporal y clasifica cada código contra "Creditors":
+    insert (nuevo), update (cambia el nombre), unchanged, conflict (el código ya existe repetido).
+    Con apply=False es una vista previa (ROLLBACK); con apply=True aplica inserts y updates
+    en la misma transacción con dos sentencias set-based.
+    """
+    if not storage.backend(conn).supports_copy:
+        raise ValueError("La importación masiva requiere Postgres (COPY)")
+    clean, conflicts = _dedup(df)
+
+    raw = conn.engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        _copy_stage(cur, clean)
+        cur.execute(SQL_CREATE_PLAN)
+        plan = _read_plan(cur)
+        if apply:
+            cur.execute(SQL_APPLY_UPDATES)
+            cur.execute(SQL_APPLY_INSERTS)
+            raw.commit()
+        else:
+            raw.rollback()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    db_conflicts = (
+        plan[plan["action"] == "conflict"]
+        .drop_duplicates("code")
+        .rename(columns={"new_name": "name"})
+        .assign(reason="El código ya existe varias veces en la base")[["code", "name", "reason"]]
+    )
+    return ImportPlan(
+        inserts=plan.loc[plan["action"] == "insert", ["code", "new_name"]].rename(columns={"new_name": "name"}).reset_index(drop=True),
+        updates=plan.loc[plan["action"] == "update", ["id", "code", "old_name", "new_name"]].reset_index(drop=True),
+        conflicts=pd.concat([conflicts, db_conflicts], ignore_index=True),
+        unchanged=int((plan["action"] == "unchanged").sum()),
+        applied=apply,
+    )
+
+# --- Exportación ---
+
+def export_creditors_csv(conn) -> bytes:
+    """Tabla completa de acreedores en CSV (code, name) vía COPY TO STDOUT."""
+    if not storage.backend(conn).supports_copy:
+        df = conn.query('SELECT abreviation AS code, name FROM "Creditors" ORDER BY abreviation, name, id', ttl=0)
+        return df.to_csv(index=False).encode("utf-8-sig")
+    buf = io.StringIO()
+    raw = conn.engine.raw_connection()
+    try:
+        raw.cursor().copy_expert(SQL_COPY_EXPORT, buf)
+        raw.rollback()
+    finally:
+        raw.close()
+    return buf.getvalue().encode("utf-8-sig")
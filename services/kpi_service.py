@@ -0,0 +1,132 @@
+import time
+import threading
+import pytz
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+# ==============================================================================
+# ACUMULADOR DE KPIs DEL DÍA (COMPARTIDO POR EL PROCESO)
+# Carga los contadores de hoy (ET) una vez y luego solo aplica las notas nuevas
+# (id > watermark). Cada refresco cuesta O(notas nuevas), no O(notas del día).
+# ==============================================================================
+
+# --- Configuración ---
+
+TZ_ET = pytz.timezone('US/Eastern')
+
+# Recarga completa periódica: corrige ids que confirmaron fuera de orden y ediciones externas
+RESYNC_SECONDS = 300
+
+EXCLUDED_AGENTS = ("test",)
+
+# --- SQL ---
+
+SQL_MAX_ID = 'SELECT COALESCE(MAX(id), 0) AS wm FROM "Logs"'
+
+SQL_DAY_COUNTERS = """
+    SELECT agent, COUNT(*) AS calls, SUM(CASE WHEN is_completed THEN 1 ELSE 0 END) AS sales
+    FROM "Logs"
+    WHERE created_at >= :start AND created_at < :end AND id <= :wm AND agent != 'test'
+    GROUP BY agent
+"""
+
+SQL_NEW_ROWS = """
+    SELECT id, agent, is_completed, created_at FROM "Logs"
+    WHERE id > :wm
+    ORDER BY id
+"""
+
+# --- Estado ---
+
+class KpiSnapshot(NamedTuple):
+    day: object
+    calls: int
+    sales: int
+    conversion: float
+    per_agent: pd.DataFrame   # agent, calls, sales (orden por calls desc)
+
+class _DayCounters:
+    def __init__(self):
+        self.day = None
+        self.watermark = 0
+        self.per_agent = {}      # agent -> [calls, sales]
+        self.synced_at = 0.0
+        self.stale = True
+
+_state = _DayCounters()
+_lock = threading.Lock()
+
+# --- Helpers ---
+
+def _today_et():
+    return datetime.now(TZ_ET).date()
+
+def _day_bounds_utc(day):
+    start = TZ_ET.localize(datetime.combine(day, datetime.min.time()))
+    end = TZ_ET.localize(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+    return start.astimezone(pytz.utc), end.astimezone(pytz.utc)
+
+def _full_load(conn, day):
+    """Contadores del día completos, consistentes con el watermark leído antes."""
+    wm = int(conn.query(SQL_MAX_ID, ttl=0).iloc[0]['wm'])
+    start, end = _day_bounds_utc(day)
+    df = conn.query(SQL_DAY_COUNTERS, params={"start": start, "end": end, "wm": wm}, ttl=0)
+
+    _state.day = day
+    _state.watermark = wm
+    _state.per_agent = {row.agent: [int(row.calls), int(row.sales or 0)] for row in df.itertuples(index=False)}
+    _state.synced_at = time.time()
+    _state.stale = False
+
+def _apply_new_rows(conn):
+    """Suma solo las notas con id > watermark que caen en el día en curso."""
+    df = conn.query(SQL_NEW_ROWS, params={"wm": _state.watermark}, ttl=0)
+    if df.empty: return
+
+    _state.watermark = int(df['id'].max())
+    start, end = _day_bounds_utc(_state.day)
+    created = pd.to_datetime(df['created_at'], utc=True)
+    df = df[(created >= start) & (created < end) & ~df['agent'].isin(EXCLUDED_AGENTS)]
+    for row in df.itertuples(index=False):
+        counters = _state.per_agent.setdefault(row.agent, [0, 0])
+        counters[0] += 1
+        counters[1] += int(bool(row.is_completed))
+
+def _snapshot() -> KpiSnapshot:
+    per_agent = pd.DataFrame(
+        [(ag, c, s) for ag, (c, s) in _state.per_agent.items()],
+        columns=['agent', 'calls', 'sales']
+    ).sort_values('calls', ascending=False, kind='stable').reset_index(drop=True)
+    calls = int(per_agent['calls'].sum())
+    sales = int(per_agent['sales'].sum())
+    return KpiSnapshot(
+        day=_state.day,
+        calls=calls,
+        sales=sales,
+        conversion=(sales / calls * 100) if calls > 0 else 0.0,
+        per_agent=per_agent,
+    )
+
+# --- API ---
+
+def invalidate():
+    """Fuerza recarga completa en el próximo refresco (p.ej. tras editar una nota)."""
+    with _lock:
+        _state.stale = True
+
+def get_today_kpis(conn):
+    """Llamadas, ventas, conversión y conteo por agente de hoy (ET)."""
+    if not conn: return None
+    try:
+        with _lock:
+            today = _today_et()
+            if _state.stale or _state.day != today or time.time() - _state.synced_at > RESYNC_SECONDS:
+                _full_load(conn, today)
+            else:
+                _apply_new_rows(conn)
+            return _snapshot()
+    except Exception as e:
+        print(f"[KPI Cache Error] {e}")
+        invalidate()
+        return None
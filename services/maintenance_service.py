@@ -0,0 +1,109 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from sqlalchemy import text
+
+import services.storage as storage
+import services.stats_service as stats_service
+import services.archive_service as archive_service
+import services.snapshot_service as snapshot_service
+
+# ==============================================================================
+# JOB DE MANTENIMIENTO DE LOGS
+# Corre solo en el proceso de la app (start_scheduler, cada MAINTENANCE_INTERVAL_HOURS)
+# o a mano / por cron:  python -m services.maintenance_service
+#   1. Crea por adelantado los meses que faltan ("Logs_YYYY_MM") y saca de "Logs_default"
+#      las filas que hayan caído ahí (archive_service).
+#   2. Meses más viejos que la retención -> Parquet comprimido en disco + DETACH/DROP.
+#   3. Limpia claves de idempotencia vencidas.
+#   4. Reconcilia el rollup Agent_Daily_Stats de los últimos días (stats_service).
+#   5. Refresca el snapshot de reportes (snapshot_service): últimos meses + meses editados.
+# Los pasos 1 y 2 son solo de Postgres (SQLite no tiene particiones).
+# ==============================================================================
+
+# --- Configuración ---
+
+# 0 = no se programa en la app (solo cron / a mano)
+MAINTENANCE_INTERVAL_HOURS = float(os.getenv("MAINTENANCE_INTERVAL_HOURS", "24"))
+
+# Primera corrida un rato después del arranque (no compite con los primeros reruns)
+MAINTENANCE_FIRST_DELAY = 300
+
+# pg_try_advisory_lock: con varios procesos de la app el job corre en uno solo
+# (migrar_datos.py usa 4201 para la sincronización)
+MAINTENANCE_LOCK_KEY = 4202
+
+# --- Job ---
+
+@contextmanager
+def _exclusive(engine):
+    """True si este proceso tiene el candado del job (siempre True en SQLite: un solo nodo)."""
+    if storage.backend(engine).name != "postgresql":
+        yield True
+        return
+    with engine.connect() as db:
+        locked = bool(db.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": MAINTENANCE_LOCK_KEY}).scalar())
+        db.commit()
+        try:
+            yield locked
+        finally:
+            if locked:
+                db.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": MAINTENANCE_LOCK_KEY})
+                db.commit()
+
+def run_maintenance(conn) -> bool:
+    """Una corrida completa del job. False si otro proceso ya lo está corriendo."""
+    with _exclusive(conn.engine) as locked:
+        if not locked:
+            print("[Maintenance] otro proceso está corriendo el mantenimiento")
+            return False
+        created, archived = 0, []
+        if storage.backend(conn.engine).name == "postgresql":
+            created = archive_service.ensure_partitions(conn)
+            archived = archive_service.archive_old_partitions(conn)
+        pruned = archive_service.prune_idempotency_keys(conn)
+        reconciled = stats_service.rebuild_daily_stats(conn)
+        try:
+            snapshot_months = len(snapshot_service.build_snapshot(conn).get("months", {}))
+        except Exception as e:
+            print(f"[Snapshot Error] {e}")
+            snapshot_months = 0
+    print(f"[Maintenance] particiones nuevas: {created} | meses archivados: {len(archived)} | "
+          f"claves vencidas: {pruned} | rollup reconciliado: {'sí' if reconciled else 'no'} | "
+          f"meses en el snapshot: {snapshot_months}")
+    return True
+
+# --- Programación en el proceso de la app ---
+
+_scheduler_started = False
+_scheduler_lock = threading.Lock()
+
+def _maintenance_loop(conn):
+    time.sleep(MAINTENANCE_FIRST_DELAY)
+    while True:
+        try:
+            run_maintenance(conn)
+        except Exception as e:
+            print(f"[Maintenance Error] {e}")
+        time.sleep(MAINTENANCE_INTERVAL_HOURS * 3600)
+
+def start_scheduler(conn):
+    """Corre run_maintenance en un hilo de fondo cada MAINTENANCE_INTERVAL_HOURS. Una vez por proceso."""
+    global _scheduler_started
+    if not conn or MAINTENANCE_INTERVAL_HOURS <= 0: return
+    with _scheduler_lock:
+        if _scheduler_started: return
+        _scheduler_started = True
+    threading.Thread(target=_maintenance_loop, args=(conn,), daemon=True, name="logs-maintenance").start()
+
+# --- Ejecución como Job ---
+
+if __name__ == "__main__":
+    from types import SimpleNamespace
+    from sqlalchemy import create_engine
+
+    # Fuera de Streamlit solo hace falta el engine (mismo DATABASE_URL que la app en Docker)
+    engine = create_engine(os.environ["DATABASE_URL"])
+    storage.prepare_engine(engine)
+    run_maintenance(SimpleNamespace(engine=engine))
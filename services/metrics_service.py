@@ -0,0 +1,176 @@
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, start_http_server, write_to_textfile
+from sqlalchemy import event
+
+# ==============================================================================
+# MÉTRICAS DEL PROCESO (FORMATO PROMETHEUS)
+# Un solo registro por proceso de Streamlit, expuesto en http://<host>:METRICS_PORT/metrics
+# o volcado a METRICS_FILE (textfile collector de node_exporter) si está definido.
+# Reruns por vista, consultas por función de servicio, pool, usuarios conectados, cachés,
+# commit_log y jobs de reportes.
+# ==============================================================================
+
+# --- Configuración ---
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+
+METRICS_FILE = os.getenv("METRICS_FILE")
+
+METRICS_FILE_INTERVAL = 15
+
+# Solo estos paquetes cuentan como "función de servicio" al atribuir una consulta
+CALLER_PREFIXES = ("services.", "vistas.")
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+_RERUN_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30)
+_JOB_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200)
+
+# --- Métricas ---
+
+RERUNS = Counter("app_reruns_total", "Reruns del script por vista", ["view"])
+RERUN_SECONDS = Histogram("app_rerun_seconds", "Duración del rerun por vista", ["view"], buckets=_RERUN_BUCKETS)
+
+DB_QUERIES = Counter("db_queries_total", "Sentencias enviadas a la BD por función", ["caller"])
+DB_QUERY_SECONDS = Histogram("db_query_seconds", "Latencia de sentencias por función", ["caller"], buckets=_LATENCY_BUCKETS)
+DB_QUERY_ERRORS = Counter("db_query_errors_total", "Sentencias con error por función", ["caller"])
+
+CACHE_REQUESTS = Counter("app_cache_requests_total", "Lecturas de cachés con TTL (hit/miss)", ["cache", "result"])
+
+NOTE_COMMITS = Counter("notes_commit_total", "Notas guardadas por commit_log", ["outcome"])
+NOTE_COMMIT_SECONDS = Histogram("notes_commit_seconds", "Duración de commit_log", buckets=_LATENCY_BUCKETS)
+
+REPORT_JOBS = Counter("report_jobs_total", "Jobs de reportes terminados", ["report_type", "status"])
+REPORT_JOB_SECONDS = Histogram("report_job_seconds", "Duración de jobs de reportes", ["report_type"], buckets=_JOB_BUCKETS)
+REPORT_JOB_ROWS = Counter("report_job_rows_total", "Filas exportadas por jobs de reportes", ["report_type"])
+
+POOL_SIZE = Gauge("db_pool_size", "Tamaño configurado del pool")
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Conexiones del pool en uso")
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Conexiones abiertas por encima del tamaño del pool")
+
+# Lo alimenta presence_service (registro de latidos en memoria del proceso)
+ONLINE_USERS = Gauge("app_online_users", "Usuarios con latido reciente en este proceso")
+
+# --- Estado del proceso ---
+
+_lock = threading.Lock()
+_exporter_started = False
+_instrumented = set()
+
+# Lectura de caché en curso en este hilo: [nombre, hubo_consulta]
+_cache_lookup = ContextVar("cache_lookup", default=None)
+
+# --- Helpers ---
+
+def _caller() -> str:
+    """Primera función de services/ o vistas/ en la pila (quién originó la consulta)."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith(CALLER_PREFIXES):
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "other"
+
+def _pool_stat(engine, name: str) -> float:
+    fn = getattr(engine.pool, name, None)
+    return float(fn()) if callable(fn) else 0.0
+
+# --- Instrumentación ---
+
+def instrument_engine(engine):
+    """Listeners de SQLAlchemy (conteo + latencia por función) y gauges del pool. Idempotente."""
+    with _lock:
+        if id(engine) in _instrumented: return
+        _instrumented.add(id(engine))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_start", []).append((time.perf_counter(), _caller()))
+        lookup = _cache_lookup.get()
+        if lookup is not None:
+            lookup[1] = True
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start, caller = conn.info["metrics_start"].pop()
+        DB_QUERIES.labels(caller).inc()
+        DB_QUERY_SECONDS.labels(caller).observe(time.perf_counter() - start)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        stack = exception_context.connection.info.get("metrics_start") if exception_context.connection else None
+        if stack:
+            _, caller = stack.pop()
+            DB_QUERY_ERRORS.labels(caller).inc()
+
+    POOL_SIZE.set_function(lambda: _pool_stat(engine, "size"))
+    POOL_CHECKED_OUT.set_function(lambda: _pool_stat(engine, "checkedout"))
+    POOL_OVERFLOW.set_function(lambda: max(_pool_stat(engine, "overflow"), 0.0))
+
+def start_exporter():
+    """Servidor HTTP de /metrics (o volcado periódico a METRICS_FILE). Una vez por proceso."""
+    global _exporter_started
+    with _lock:
+        if _exporter_started: return
+        _exporter_started = True
+    try:
+        if METRICS_FILE:
+            def _dump():
+                while True:
+                    write_to_textfile(METRICS_FILE, REGISTRY)
+                    time.sleep(METRICS_FILE_INTERVAL)
+            threading.Thread(target=_dump, daemon=True, name="metrics-file").start()
+        else:
+            start_http_server(METRICS_PORT)
+    except Exception as e:
+        print(f"[Metrics Error] {e}")
+
+@contextmanager
+def track_rerun(view: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        RERUNS.labels(view).inc()
+        RERUN_SECONDS.labels(view).observe(time.perf_counter() - start)
+
+@contextmanager
+def cache_lookup(name: str):
+    """
+    Envuelve un conn.query con ttl: si durante el bloque no llegó ninguna sentencia
+    al engine, fue un hit de la caché de Streamlit.
+    """
+    token = _cache_lookup.set([name, False])
+    try:
+        yield
+    finally:
+        missed = _cache_lookup.get()[1]
+        _cache_lookup.reset(token)
+        CACHE_REQUESTS.labels(name, "miss" if missed else "hit").inc()
+
+def track_commit(fn):
+    """Decorador de commit_log: ok / duplicate (retorna None) / error, más la duración."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            new_id = fn(*args, **kwargs)
+        except Exception:
+            NOTE_COMMITS.labels("error").inc()
+            raise
+        finally:
+            NOTE_COMMIT_SECONDS.observe(time.perf_counter() - start)
+        NOTE_COMMITS.labels("ok" if new_id is not None else "duplicate").inc()
+        return new_id
+    return wrapper
+
+def observe_report_job(report_type: str, status: str, seconds: float, rows: int):
+    REPORT_JOBS.labels(report_type, status).inc()
+    REPORT_JOB_SECONDS.labels(report_type).observe(seconds)
+    REPORT_JOB_ROWS.labels(report_type).inc(rows)
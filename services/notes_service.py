@@ -1,35 +1,77 @@
 import re
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 import pytz
 from sqlalchemy import text
 
+import services.stats_service as stats_service
+import services.metrics_service as metrics_service
+
+# --- Configuración ---
+
+# Ventana de deduplicación (solo reintentos, como el cooldown de 60s anterior): misma nota
+# (ID + agente + resultado) a menos de esto = duplicado (según dónde caigan los bordes de
+# bloque, hasta dos ventanas). Cada nota reserva la clave de su bloque y la del siguiente:
+# dos reintentos a ambos lados de un borde chocan en la clave compartida (lo garantiza la
+# PK, aun en paralelo). Una llamada legítima minutos después se guarda normalmente.
+IDEMPOTENCY_WINDOW_SECONDS = 60
+
 # --- Validaciones y Helpers ---
 
 def sanitize_text_for_db(text_str: str) -> str:
     if not text_str: return ""
     return re.sub(r'\b\d{3,}\b', '[####]', text_str)
 
+def build_idempotency_key(cordoba_id: str, user_id: int, result: str, ts: datetime) -> str:
+    """Clave determinística para detectar reintentos de la misma nota en la misma ventana."""
+    bucket = int(ts.timestamp()) // IDEMPOTENCY_WINDOW_SECONDS
+    return f"{str(cordoba_id).strip()}|{int(user_id)}|{str(result).strip().lower()}|{bucket}"
+
+def idempotency_keys(cordoba_id: str, user_id: int, result: str, ts: datetime) -> tuple:
+    """(clave del bloque de ts, clave del bloque siguiente): las dos que reserva commit_log."""
+    return (
+        build_idempotency_key(cordoba_id, user_id, result, ts),
+        build_idempotency_key(cordoba_id, user_id, result, ts + timedelta(seconds=IDEMPOTENCY_WINDOW_SECONDS)),
+    )
+
 # --- Lectura de Datos (SELECT) ---
 
-def fetch_agent_history(conn, username: str, limit: int = 15):
-    if not conn: return pd.DataFrame()
-    # Usamos pd.read_sql o conn.query, asumimos conn es st.connection
-    query = 'SELECT created_at, result, cordoba_id FROM "Logs" WHERE agent ILIKE :u ORDER BY created_at DESC LIMIT :l'
-    df = conn.query(query, params={"u": username, "l": limit}, ttl=0)
-    
-    if not df.empty:
-        df['created_at'] = pd.to_datetime(df['created_at'], utc=True)
-        # Formateamos para la vista
-        df['Date'] = df['created_at'].dt.tz_convert('US/Eastern').dt.strftime('%m/%d/%Y %I:%M %p')
-        return df[['Date', 'result', 'cordoba_id']]
-    return pd.DataFrame()
+def fetch_agent_history(conn, user_id: int, limit: int = 15, cursor: tuple = None):
+    """
+    Historial del agente paginado por keyset sobre (user_id, created_at, id).
+    `cursor` es el (created_at, id) de la última fila ya mostrada; None = página más reciente.
+    Retorna (df_vista, next_cursor). next_cursor es None cuando no hay más páginas.
+    """
+    if not conn or user_id is None: return pd.DataFrame(), None
+
+    query = """
+        SELECT id, created_at, result, cordoba_id FROM "Logs"
+        WHERE user_id = :uid
+    """
+    params = {"uid": int(user_id), "l": limit}
+    if cursor:
+        # Comparación de filas: usa el índice compuesto sin OFFSET (mismo costo en cualquier página)
+        query += " AND (created_at, id) < (:c_ts, :c_id)"
+        params.update({"c_ts": cursor[0], "c_id": int(cursor[1])})
+    query += " ORDER BY created_at DESC, id DESC LIMIT :l"
+
+    df = conn.query(query, params=params, ttl=0)
+    if df.empty: return pd.DataFrame(), None
+
+    last = df.iloc[-1]
+    next_cursor = (last['created_at'], int(last['id'])) if len(df) == limit else None
+
+    df['created_at'] = pd.to_datetime(df['created_at'], utc=True)
+    # Formateamos para la vista
+    df['Date'] = df['created_at'].dt.tz_convert('US/Eastern').dt.strftime('%m/%d/%Y %I:%M %p')
+    return df[['Date', 'result', 'cordoba_id']], next_cursor
 
 def fetch_affiliates_list(conn):
     """Obtiene lista de afiliados."""
     if not conn: return []
     try:
-        df = conn.query('SELECT name FROM "Affiliates" ORDER BY name', ttl=3600)
+        with metrics_service.cache_lookup("affiliates"):
+            df = conn.query('SELECT name FROM "Affiliates" ORDER BY name', ttl=3600)
         return df['name'].tolist()
     except Exception as e:
         print(f"Error fetching affiliates: {e}")
@@ -37,27 +79,44 @@ def fetch_affiliates_list(conn):
 
 # --- Escritura de Datos (INSERT) ---
 
+@metrics_service.track_commit
 def commit_log(conn, payload: dict):
+    """
+    Inserta la nota de forma idempotente.
+    Retorna el id insertado, o None si ya existía una nota con la misma clave (duplicado).
+    """
     comments_safe = sanitize_text_for_db(payload.get('comments', ''))
     
     # Extraemos el nuevo campo (default None si no viene)
     transfer_status = payload.get('transfer_status', None)
 
+    created_at = datetime.now(pytz.utc)
+    uid = int(payload['user_id'])
+
     sql = """
         INSERT INTO "Logs" (
             created_at, user_id, agent, customer, cordoba_id, 
             result, comments, affiliate, info_until, client_language, 
-            transfer_status
+            transfer_status, idempotency_key
         )
         VALUES (
             :created_at, :uid, :agent, NULL, :cid, 
             :res, :comm, :aff, :info, :lang, 
-            :trans
+            :trans, :ikey
         )
+        RETURNING id
+    """
+    # Las claves se reservan primero: si alguna ya existe, es un reintento y no se inserta la nota
+    sql_claim = """
+        INSERT INTO "Logs_Idempotency" (idempotency_key, created_at)
+        VALUES (:ikey, :created_at), (:ikey_next, :created_at)
+        ON CONFLICT (idempotency_key) DO NOTHING
+        RETURNING idempotency_key
     """
+    ikey, ikey_next = idempotency_keys(payload['cordoba_id'], uid, payload['result'], created_at)
     params = {
-        "created_at": datetime.now(pytz.utc), 
-        "uid": int(payload['user_id']),
+        "created_at": created_at, 
+        "uid": uid,
         "agent": payload['username'],
         "cid": payload['cordoba_id'],
         "res": payload['result'],
@@ -65,11 +124,18 @@ def commit_log(conn, payload: dict):
         "aff": payload['affiliate'],
         "info": payload['info_until'],
         "lang": payload['client_language'],
-        "trans": transfer_status  # <--- Nuevo parámetro
+        "trans": transfer_status,
+        "ikey": ikey,
+        "ikey_next": ikey_next
     }
     
-    # Ejecutamos transacción de escritura
+    # Ejecutamos transacción de escritura (menos de 2 claves reservadas = ya existía una nota)
     with conn.session as session:
-        session.execute(text(sql), params)
+        if len(session.execute(text(sql_claim), params).fetchall()) < 2:
+            session.rollback()
+            return None
+        new_id = session.execute(text(sql), params).scalar()
+        # Rollup diario del agente en la misma transacción (Inicio lo lee pre-agregado)
+        stats_service.bump_daily_stat(session, uid, created_at, payload['result'])
         session.commit()
-    return True
\ No newline at end of file
+    return new_id
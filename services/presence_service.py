@@ -0,0 +1,178 @@
+import atexit
+import threading
+import pytz
+import pandas as pd
+from datetime import datetime, timedelta
+from sqlalchemy import text
+import services.storage as storage
+import services.metrics_service as metrics_service
+
+# ==============================================================================
+# PRESENCIA DEL STAFF (HEARTBEATS)
+# Cada sesión late en un registro en memoria del proceso (sin BD); como mucho una vez
+# cada HEARTBEAT_SECONDS por usuario el latido se encola y se escribe en lote en
+# "User_Presence" (una fila por usuario). "Staff Online" sale de una sola consulta
+# sobre esa tabla chica, sin recorrer "Logs".
+#   last_seen   -> último latido (pestaña abierta, aunque no haga nada)
+#   last_active -> último rerun por interacción (clic, búsqueda, nota)
+# ==============================================================================
+
+# --- Configuración ---
+
+# Latido de la pestaña (st.fragment de main.py) y escritura máxima por usuario
+HEARTBEAT_SECONDS = 30
+
+FLUSH_SECONDS = 10
+
+# Sin latido en este tiempo (3 latidos perdidos) = desconectado
+ONLINE_SECONDS = 90
+
+# Conectado pero sin interacción en este tiempo = inactivo
+IDLE_SECONDS = 300
+
+# --- SQL ---
+
+PRESENCE_COLUMNS = {
+    "username": "TEXT", "user_id": "INT", "view": "TEXT",
+    "last_seen": "TIMESTAMPTZ", "last_active": "TIMESTAMPTZ",
+}
+
+SQL_UPSERT_PRESENCE = """
+    INSERT INTO "User_Presence" (username, user_id, view, last_seen, last_active)
+    SELECT R.username, R.user_id, R.view, R.last_seen, R.last_active FROM {rows}
+    WHERE TRUE
+    ON CONFLICT (username) DO UPDATE SET
+        user_id = EXCLUDED.user_id, view = EXCLUDED.view,
+        last_seen = EXCLUDED.last_seen, last_active = EXCLUDED.last_active
+"""
+
+SQL_DELETE_PRESENCE = 'DELETE FROM "User_Presence" WHERE username = :u'
+
+SQL_ONLINE = """
+    SELECT P.username, COALESCE(U.name, P.username) AS name, U.role, P.view, P.last_seen, P.last_active
+    FROM "User_Presence" P
+    LEFT JOIN "Users" U ON U.id = P.user_id
+    WHERE P.last_seen >= :since
+    ORDER BY P.last_active DESC
+"""
+
+# --- Registro en memoria ---
+
+class _Registry:
+    def __init__(self):
+        self.sessions = {}       # username -> dict (PRESENCE_COLUMNS + written_at)
+        self.pending = set()     # usernames con latido por escribir
+        self.conn = None
+        self.timer = None
+        self.lock = threading.Lock()
+
+_registry = _Registry()
+
+def _now() -> datetime:
+    return datetime.now(pytz.utc)
+
+def flush_presence() -> int:
+    """Escribe los latidos pendientes en un solo upsert. Retorna cuántos usuarios se enviaron."""
+    with _registry.lock:
+        batch = [
+            {k: _registry.sessions[u][k] for k in PRESENCE_COLUMNS}
+            for u in _registry.pending if u in _registry.sessions
+        ]
+        names, conn = _registry.pending, _registry.conn
+        _registry.pending, _registry.timer = set(), None
+    if not batch or not conn: return 0
+
+    db = storage.backend(conn)
+    sql = SQL_UPSERT_PRESENCE.format(rows=db.json_rows(":rows", PRESENCE_COLUMNS))
+    try:
+        with conn.session as session:
+            session.execute(text(sql), {"rows": db.bind_rows(batch)})
+            session.commit()
+        return len(batch)
+    except Exception as e:
+        print(f"[Presence Flush Error] {e}")
+        # Se reintentan en el próximo flush (con el último latido de cada uno)
+        with _registry.lock:
+            _registry.pending |= names
+        return 0
+
+atexit.register(flush_presence)
+
+def online_count() -> int:
+    """Usuarios con latido en los últimos ONLINE_SECONDS según el registro en memoria (sin BD)."""
+    since = _now() - timedelta(seconds=ONLINE_SECONDS)
+    with _registry.lock:
+        return sum(1 for entry in _registry.sessions.values() if entry["last_seen"] >= since)
+
+metrics_service.ONLINE_USERS.set_function(online_count)
+
+def heartbeat(conn, username: str, user_id: int = None, view: str = None, active: bool = True) -> bool:
+    """
+    Latido de una sesión. Siempre actualiza el registro en memoria; se encola para la BD solo
+    si pasaron HEARTBEAT_SECONDS desde la última escritura del usuario o si cambió de vista.
+    active=False para latidos de fondo (no cuentan como interacción).
+    Retorna True si el latido se encoló.
+    """
+    if not conn or not username: return False
+    now = _now()
+    with _registry.lock:
+        entry = _registry.sessions.setdefault(username, {
+            "username": username, "user_id": None, "view": None,
+            "last_seen": now, "last_active": now, "written_at": None,
+        })
+        moved = view is not None and view != entry["view"]
+        entry["last_seen"] = now
+        if active:
+            entry["last_active"] = now
+        if user_id is not None:
+            entry["user_id"] = int(user_id)
+        if view is not None:
+            entry["view"] = view
+
+        due = entry["written_at"] is None or moved or (now - entry["written_at"]).total_seconds() >= HEARTBEAT_SECONDS
+        if not due: return False
+        entry["written_at"] = now
+        _registry.pending.add(username)
+        _registry.conn = conn
+        if _registry.timer is None:
+            _registry.timer = threading.Timer(FLUSH_SECONDS, flush_presence)
+            _registry.timer.daemon = True
+            _registry.timer.start()
+    return True
+
+def sign_out(conn, username: str):
+    """Quita al usuario del registro y de la tabla (Cerrar Sesión): sale de "Staff Online" ya."""
+    if not username: return
+    with _registry.lock:
+        _registry.sessions.pop(username, None)
+        _registry.pending.discard(username)
+    if not conn: return
+    try:
+        with conn.session as session:
+            session.execute(text(SQL_DELETE_PRESENCE), {"u": username})
+            session.commit()
+    except Exception as e:
+        print(f"[Presence Sign Out Error] {e}")
+
+# --- Lectura (Panel Admin) ---
+
+def fetch_online_staff(conn) -> pd.DataFrame:
+    """
+    Usuarios con latido en los últimos ONLINE_SECONDS:
+    username, name, role, view, last_seen, last_active, idle_seconds, idle.
+    """
+    if not conn: return pd.DataFrame()
+    try:
+        now = _now()
+        df = conn.query(SQL_ONLINE, params={"since": now - timedelta(seconds=ONLINE_SECONDS)}, ttl=0)
+    except Exception as e:
+        print(f"[Presence Fetch Error] {e}")
+        return pd.DataFrame()
+    if df.empty: return df
+
+    # SQLite devuelve los timestamps como texto UTC
+    for col in ("last_seen", "last_active"):
+        df[col] = pd.to_datetime(df[col], utc=True)
+    df['idle_seconds'] = (now - df['last_active']).dt.total_seconds().clip(lower=0).astype(int)
+    df['idle'] = df['idle_seconds'] >= IDLE_SECONDS
+    return df
@@ -0,0 +1,166 @@
+import os
+import re
+import sys
+import time
+import pstats
+import cProfile
+import threading
+from io import StringIO
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import pandas as pd
+
+# ==============================================================================
+# PROFILER POR RERUN (OPT-IN)
+# Con APP_PROFILING=1 o el switch del panel admin, cada rerun más lento que el umbral deja:
+#   <ts>_<vista>_<usuario>_<ms>.pstats     -> snakeviz / pstats
+#   <ts>_<vista>_<usuario>_<ms>.collapsed  -> flamegraph.pl / speedscope (pilas muestreadas)
+# en PROFILES_DIR, rotando los más viejos.
+# ==============================================================================
+
+# --- Configuración ---
+
+PROFILES_DIR = os.getenv("PROFILES_DIR", os.path.join("data", "profiles"))
+
+MAX_PROFILES = int(os.getenv("PROFILES_MAX", "200"))
+
+# Solo se guardan reruns más lentos que esto (los rápidos no interesan y llenan el disco)
+DEFAULT_MIN_SECONDS = float(os.getenv("PROFILES_MIN_SECONDS", "0.5"))
+
+SAMPLE_INTERVAL = 0.005
+
+FILE_RE = re.compile(r'^(\d+)_(.+)_(.+)_(\d+)\.pstats$')
+
+# --- Estado del proceso ---
+
+class _Settings:
+    def __init__(self):
+        self.enabled = os.getenv("APP_PROFILING", "0") == "1"
+        self.min_seconds = DEFAULT_MIN_SECONDS
+
+settings = _Settings()
+
+# cProfile es uno por proceso en Python 3.12+: un rerun perfilado a la vez (los demás se saltan)
+_profile_lock = threading.Lock()
+
+_current = ContextVar("profiled_rerun", default=None)
+
+# --- Muestreo de Pilas ---
+
+class _StackSampler(threading.Thread):
+    """Muestrea la pila del hilo del rerun cada SAMPLE_INTERVAL (formato collapsed de flamegraph)."""
+    def __init__(self, thread_id: int):
+        super().__init__(daemon=True, name="profiler-sampler")
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+# --- Helpers ---
+
+def _safe(part: str) -> str:
+    return re.sub(r'[^A-Za-z0-9.-]+', '-', str(part or "anon")).strip('-') or "anon"
+
+def _rotate():
+    files = sorted(
+        (f for f in os.listdir(PROFILES_DIR) if f.endswith((".pstats", ".collapsed"))),
+        key=lambda f: os.path.getmtime(os.path.join(PROFILES_DIR, f))
+    )
+    # Cada rerun deja dos archivos
+    for name in files[:max(len(files) - 2 * MAX_PROFILES, 0)]:
+        try:
+            os.remove(os.path.join(PROFILES_DIR, name))
+        except OSError:
+            pass
+
+def _save(profile: cProfile.Profile, sampler: _StackSampler, view: str, username: str, seconds: float) -> str:
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    base = os.path.join(PROFILES_DIR, f"{int(time.time() * 1000)}_{_safe(view)}_{_safe(username)}_{int(seconds * 1000)}")
+    profile.dump_stats(base + ".pstats")
+    with open(base + ".collapsed", "w", encoding="utf-8") as f:
+        for stack, count in sampler.stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    _rotate()
+    return base + ".pstats"
+
+# --- API ---
+
+@contextmanager
+def profile_rerun(username: str):
+    """
+    Envuelve un rerun completo. Si el profiling está activo (y nadie más está perfilando)
+    mide con cProfile + muestreo de pilas y guarda si supera settings.min_seconds.
+    La vista se etiqueta después con label_rerun (se conoce a mitad del script).
+    """
+    if not settings.enabled or not _profile_lock.acquire(blocking=False):
+        yield
+        return
+
+    record = {"view": "main"}
+    token = _current.set(record)
+    profile = cProfile.Profile()
+    sampler = _StackSampler(threading.get_ident())
+    start = time.perf_counter()
+    try:
+        sampler.start()
+        profile.enable()
+        yield
+    finally:
+        profile.disable()
+        sampler.stop()
+        seconds = time.perf_counter() - start
+        _current.reset(token)
+        try:
+            if seconds >= settings.min_seconds:
+                _save(profile, sampler, record["view"], username, seconds)
+        except Exception as e:
+            print(f"[Profiler Error] {e}")
+        finally:
+            _profile_lock.release()
+
+def label_rerun(view: str):
+    """Nombre de la vista del rerun que se está perfilando (no-op si no hay perfilado)."""
+    record = _current.get()
+    if record is not None:
+        record["view"] = view
+
+def list_profiles(limit: int = 50) -> pd.DataFrame:
+    """Reruns guardados, del más lento al más rápido: when, view, user, seconds, pstats, collapsed."""
+    if not os.path.isdir(PROFILES_DIR): return pd.DataFrame()
+    rows = []
+    for name in os.listdir(PROFILES_DIR):
+        m = FILE_RE.match(name)
+        if not m: continue
+        path = os.path.join(PROFILES_DIR, name)
+        rows.append({
+            "when": pd.to_datetime(int(m.group(1)), unit="ms", utc=True),
+            "view": m.group(2),
+            "user": m.group(3),
+            "seconds": int(m.group(4)) / 1000,
+            "pstats": path,
+            "collapsed": path[:-len(".pstats")] + ".collapsed",
+        })
+    if not rows: return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values("seconds", ascending=False).head(limit).reset_index(drop=True)
+
+def top_functions(pstats_path: str, limit: int = 25) -> str:
+    """Resumen de texto (por tiempo acumulado) de un .pstats."""
+    out = StringIO()
+    stats = pstats.Stats(pstats_path, stream=out)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,93 @@
+import pandas as pd
+from datetime import date, datetime
+from typing import NamedTuple, Optional
+
+# ==============================================================================
+# CAPA DE ACCESO: columnas explícitas por caso de uso + registros tipados
+# Nada de SELECT *: cada pantalla trae solo lo que pinta (sin comments ni hashes de más).
+# ==============================================================================
+
+# --- Proyecciones por caso de uso ---
+
+LOG_EXPORT_COLUMNS = (
+    "id", "created_at", "agent", "cordoba_id", "result", "is_completed",
+    "affiliate", "comments", "info_until", "client_language", "transfer_status"
+)
+
+LOG_EDITOR_COLUMNS = ("id", "created_at", "agent", "cordoba_id", "result", "comments")
+
+CREDITOR_COLUMNS = ("id", "name", "abreviation")
+
+SEARCH_MISS_COLUMNS = ("id", "abreviation", "cordoba_id", "created_at")
+
+UPDATE_COLUMNS = ("id", "date", "title", "message", "category")
+
+USER_PUBLIC_COLUMNS = ("id", "username", "name", "role", "active")
+
+# Solo para autenticación (única proyección que incluye el hash)
+USER_AUTH_COLUMNS = USER_PUBLIC_COLUMNS + ("password",)
+
+def select_list(columns, alias: str = None) -> str:
+    """'"col1", "col2"' (con prefijo de alias opcional) para armar el SELECT."""
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(f'{prefix}"{c}"' for c in columns)
+
+# --- Dtypes compactos (declarados una sola vez) ---
+
+LOG_DTYPES = {
+    "created_at": "datetime64[ns, UTC]",
+    "agent": "category",
+    "result": "category",
+    "affiliate": "category",
+    "info_until": "category",
+    "client_language": "category",
+    "transfer_status": "category",
+    "is_completed": "bool",
+}
+
+def apply_dtypes(df: pd.DataFrame, dtypes: dict = LOG_DTYPES) -> pd.DataFrame:
+    """Aplica los dtypes declarados a las columnas presentes (in-place y retorna el df)."""
+    if df.empty: return df
+    for col, dtype in dtypes.items():
+        if col not in df.columns: continue
+        if dtype.startswith("datetime64"):
+            df[col] = pd.to_datetime(df[col], utc=True).astype(dtype)
+        elif dtype == "bool":
+            df[col] = df[col].fillna(False).astype(bool)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+# --- Registros tipados ---
+
+class UserRecord(NamedTuple):
+    id: int
+    username: str
+    name: str
+    role: str
+    active: bool
+
+class LogEditorRecord(NamedTuple):
+    id: int
+    created_at: datetime
+    agent: str
+    cordoba_id: str
+    result: str
+    comments: Optional[str]
+
+class CreditorRecord(NamedTuple):
+    id: int
+    name: str
+    abreviation: Optional[str]
+
+class UpdateRecord(NamedTuple):
+    id: int
+    date: date
+    title: str
+    message: str
+    category: str
+
+def to_records(df: pd.DataFrame, record_cls) -> list:
+    """DataFrame -> lista de NamedTuples (columnas en el orden de los campos)."""
+    if df.empty: return []
+    return [record_cls(*row) for row in df[list(record_cls._fields)].itertuples(index=False, name=None)]
@@ -0,0 +1,190 @@
+import os
+import time
+import json
+import hashlib
+import threading
+import pytz
+from datetime import datetime, date
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+
+import services.admin_service as admin_service
+import services.report_service as report_service
+import services.snapshot_service as snapshot_service
+import services.metrics_service as metrics_service
+from services.records import LOG_EXPORT_COLUMNS
+
+# ==============================================================================
+# COLA DE REPORTES EN SEGUNDO PLANO
+# Los pedidos se identifican por (tipo, rango, agente): dos supervisores que piden lo mismo
+# comparten el mismo job y el mismo archivo. El script de Streamlit solo consulta el progreso.
+# ==============================================================================
+
+# --- Configuración ---
+
+MAX_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+
+# Rango que incluye hoy (o el futuro): los datos siguen cambiando -> caché corta
+OPEN_RANGE_TTL = 600
+
+# Rango cerrado: solo cambia si se edita una nota vieja (update_log_entry borra los afectados);
+# igual se vencen para que la caché no crezca sin límite
+CLOSED_RANGE_TTL = 7 * 24 * 3600
+
+# Jobs terminados se olvidan del registro en memoria pasado este tiempo (el archivo queda en disco)
+JOB_RETENTION = 24 * 3600
+
+CACHE_DIR = report_service.CACHE_DIR
+
+TZ_ET = pytz.timezone('US/Eastern')
+
+ACTIVE_STATES = ("queued", "running")
+
+# --- Estado del proceso ---
+
+@dataclass
+class ReportJob:
+    key: str
+    report_type: str
+    start_date: date
+    end_date: date
+    target_agent: str
+    status: str = "queued"      # queued | running | done | empty | error
+    progress: float = 0.0
+    rows: int = 0
+    total: int = 0
+    path: str = None
+    error: str = None
+    cached: bool = False
+    created: float = field(default_factory=time.time)
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="report")
+_jobs = {}
+_lock = threading.Lock()
+
+# --- Helpers ---
+
+def job_key(report_type: str, start_date, end_date, target_agent: str) -> str:
+    raw = json.dumps([report_type, str(start_date), str(end_date), target_agent])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+def _is_closed_range(end_date) -> bool:
+    """Rango histórico (termina antes de hoy ET): el resultado ya no cambia."""
+    return end_date < datetime.now(TZ_ET).date()
+
+def _purge_expired():
+    """Borra artefactos vencidos (abiertos y cerrados) y jobs viejos del registro."""
+    now = time.time()
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            age = now - os.path.getmtime(path)
+            expired_open = name.endswith("_open.xlsx") and age > OPEN_RANGE_TTL
+            expired_closed = name.endswith("_closed.xlsx") and age > CLOSED_RANGE_TTL
+            # .part huérfanos (worker caído a mitad de escritura)
+            stale_part = name.endswith(".part") and age > report_service.TEMP_FILE_MAX_AGE
+            if expired_open or expired_closed or stale_part:
+                os.remove(path)
+        except OSError:
+            pass
+    for key in [k for k, j in _jobs.items() if j.status not in ACTIVE_STATES and now - j.created > JOB_RETENTION]:
+        del _jobs[key]
+
+def _cached_artifact(job: ReportJob, closed: bool):
+    path = report_service.cached_report_path(job.key, job.start_date, job.end_date, closed)
+    if not os.path.exists(path): return None
+    if time.time() - os.path.getmtime(path) <= (CLOSED_RANGE_TTL if closed else OPEN_RANGE_TTL):
+        return path
+    return None
+
+def _tracked(job: ReportJob, chunks):
+    for chunk in chunks:
+        job.rows += len(chunk)
+        if job.total:
+            job.progress = min(job.rows / job.total, 0.99)
+        yield chunk
+
+def _run(conn, job: ReportJob, user_map: dict):
+    job.status = "running"
+    started = time.perf_counter()
+    try:
+        order_by = report_service.REPORT_ORDER[job.report_type]
+        if job.report_type in report_service.SNAPSHOT_REPORTS and snapshot_service.covers(job.start_date, job.end_date):
+            # Rango cerrado y cubierto por el snapshot: Parquet local, sin tocar Postgres
+            job.total = snapshot_service.count_snapshot_logs(job.start_date, job.end_date, job.target_agent)
+            chunks = snapshot_service.iter_snapshot_logs(
+                job.start_date, job.end_date, job.target_agent, LOG_EXPORT_COLUMNS, order_by=order_by
+            )
+        else:
+            job.total = admin_service.count_logs_for_export(conn, job.start_date, job.end_date, job.target_agent)
+            chunks = admin_service.iter_logs_for_export(
+                conn, job.start_date, job.end_date, job.target_agent, order_by=order_by
+            )
+        final_path = report_service.cached_report_path(
+            job.key, job.start_date, job.end_date, _is_closed_range(job.end_date)
+        )
+        # Se escribe a .part y se renombra: nadie sirve un archivo a medio escribir
+        part_path = final_path + ".part"
+        rows = report_service.build_report_file(_tracked(job, chunks), user_map, job.report_type, part_path)
+        if rows:
+            os.replace(part_path, final_path)
+            job.path = final_path
+            job.status = "done"
+        else:
+            job.status = "empty"
+        job.progress = 1.0
+    except Exception as e:
+        print(f"[Report Job Error] {e}")
+        job.error = str(e)
+        job.status = "error"
+    metrics_service.observe_report_job(job.report_type, job.status, time.perf_counter() - started, job.rows)
+
+# --- API ---
+
+def submit_report(conn, report_type: str, start_date, end_date, target_agent: str, user_map: dict) -> ReportJob:
+    """
+    Encola (o reutiliza) el reporte pedido. Si hay un job idéntico en curso se comparte;
+    si hay un archivo en caché válido se devuelve terminado sin tocar la BD.
+    """
+    key = job_key(report_type, start_date, end_date, target_agent)
+    closed = _is_closed_range(end_date)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    with _lock:
+        _purge_expired()
+        job = _jobs.get(key)
+        if job and job.status in ACTIVE_STATES:
+            return job
+
+        job = ReportJob(key, report_type, start_date, end_date, target_agent)
+        cached_path = _cached_artifact(job, closed)
+        if cached_path:
+            job.status, job.path, job.progress, job.cached = "done", cached_path, 1.0, True
+            _jobs[key] = job
+            return job
+
+        _jobs[key] = job
+    _executor.submit(_run, conn, job, user_map)
+    return job
+
+def get_job(key: str):
+    """Job del registro; None si terminó y su archivo ya no está (vencido o invalidado)."""
+    job = _jobs.get(key)
+    if job and job.status == "done" and not os.path.exists(job.path):
+        return None
+    return job
+
+# --- Snapshot Parquet bajo demanda ---
+
+_snapshot_future = None
+
+def refresh_snapshot(conn):
+    """Encola un refresco del snapshot (uno a la vez) en el mismo pool de reportes."""
+    global _snapshot_future
+    with _lock:
+        if _snapshot_future is None or _snapshot_future.done():
+            _snapshot_future = _executor.submit(snapshot_service.build_snapshot, conn)
+    return _snapshot_future
+
+def snapshot_refreshing() -> bool:
+    return _snapshot_future is not None and not _snapshot_future.done()
@@ -0,0 +1,330 @@
+import os
+import re
+import tempfile
+from datetime import date
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+# ==============================================================================
+# MOTOR DE REPORTES EN STREAMING (EXCEL, MEMORIA CONSTANTE)
+# Lee Logs por bloques y escribe con xlsxwriter en modo constant_memory a un archivo
+# temporal: el pico de RAM no depende de cuántos meses se exporten.
+# ==============================================================================
+
+# --- Configuración ---
+
+REPORT_STRATEGIC = "Estratégico (KPIs & Negocio)"
+REPORT_OPERATIONAL = "Operativo (Desempeño & Detalle)"
+REPORT_QUALITY = "Calidad (Fricción & Errores)"
+
+REPORT_TYPES = (REPORT_STRATEGIC, REPORT_OPERATIONAL, REPORT_QUALITY)
+
+# Reportes que pueden leer del snapshot Parquet (services/snapshot_service) en rangos cerrados
+SNAPSHOT_REPORTS = (REPORT_STRATEGIC, REPORT_QUALITY)
+
+# Orden de lectura por tipo: el Operativo necesita las filas agrupadas por agente
+# (una hoja por agente, escrita fila a fila en orden)
+REPORT_ORDER = {
+    REPORT_STRATEGIC: "created_at DESC",
+    REPORT_OPERATIONAL: "lower(agent), agent, created_at DESC",
+    REPORT_QUALITY: "created_at DESC",
+}
+
+REPORTS_DIR = os.getenv("REPORTS_DIR", os.path.join(tempfile.gettempdir(), "cordoba_reports"))
+
+# Archivos a medio escribir (.part) más viejos que esto se borran en la próxima purga
+TEMP_FILE_MAX_AGE = 3600
+
+# Caché de reportes terminados (services/report_jobs)
+CACHE_DIR = os.path.join(REPORTS_DIR, "cache")
+
+# Nombres de hoja de Excel: máximo 31 caracteres y sin []:*?/\\
+SHEET_NAME_MAX = 31
+INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+# Columnas permitidas en la auditoría (sin id, user_id, customer)
+AUDIT_COLUMNS = [
+    'created_at', 'agent', 'cordoba_id', 'result',
+    'affiliate', 'comments', 'info_until',
+    'client_language', 'transfer_status'
+]
+
+# --- Helpers ---
+
+def cached_report_path(key: str, start_date, end_date, closed: bool) -> str:
+    """Archivo en caché de un reporte. Los de rango cerrado llevan el rango en el nombre."""
+    if not closed:
+        return os.path.join(CACHE_DIR, f"{key}_open.xlsx")
+    return os.path.join(CACHE_DIR, f"{key}_{start_date}_{end_date}_closed.xlsx")
+
+def drop_closed_reports(day: date) -> int:
+    """Borra los reportes cerrados en caché cuyo rango incluye `day` (nota editada). Retorna cuántos."""
+    if not os.path.isdir(CACHE_DIR): return 0
+    dropped = 0
+    for name in os.listdir(CACHE_DIR):
+        parts = name.split("_")
+        if len(parts) != 4 or parts[3] != "closed.xlsx": continue
+        try:
+            if date.fromisoformat(parts[1]) <= day <= date.fromisoformat(parts[2]):
+                os.remove(os.path.join(CACHE_DIR, name))
+                dropped += 1
+        except (ValueError, OSError):
+            pass
+    return dropped
+
+def _naive_utc(series: pd.Series) -> pd.Series:
+    """Quita la zona (mismo criterio que el motor anterior: hora UTC sin tz)."""
+    if series.dt.tz is not None:
+        return series.dt.tz_localize(None)
+    return series
+
+def _rows(df: pd.DataFrame):
+    """Filas como tuplas de objetos Python (NaN/NaT -> None = celda vacía)."""
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+def _write_header(ws, columns, fmt):
+    for col, val in enumerate(columns):
+        ws.write(0, col, val, fmt)
+
+def _write_frame(ws, df: pd.DataFrame, header_fmt, start_row: int = 1) -> int:
+    """Escribe encabezado + filas en orden (requisito de constant_memory). Retorna la próxima fila."""
+    _write_header(ws, df.columns, header_fmt)
+    row = start_row
+    for values in _rows(df):
+        ws.write_row(row, 0, values)
+        row += 1
+    return row
+
+def _sheet_name(name, used: set) -> str:
+    """
+    Nombre de hoja válido y único (Excel no distingue mayúsculas): quita caracteres inválidos,
+    recorta a 31 y agrega ' (2)', ' (3)'... si ya se usó. Registra el nombre en `used`.
+    """
+    base = INVALID_SHEET_CHARS.sub('', str(name)).strip("' ")[:SHEET_NAME_MAX] or "Agente"
+    candidate, n = base, 1
+    while candidate.lower() in used:
+        n += 1
+        suffix = f" ({n})"
+        candidate = base[:SHEET_NAME_MAX - len(suffix)].rstrip() + suffix
+    used.add(candidate.lower())
+    return candidate
+
+def _formats(workbook) -> dict:
+    return {
+        'header': workbook.add_format({'bold': True, 'font_color': 'white', 'bg_color': '#1F4E78', 'border': 1, 'align': 'center', 'valign': 'vcenter', 'text_wrap': True}),
+        'cell': workbook.add_format({'border': 1, 'align': 'left', 'valign': 'top', 'text_wrap': True}),
+        'center': workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter'}),
+        'pct': workbook.add_format({'num_format': '0.0%', 'border': 1, 'align': 'center', 'valign': 'vcenter'}),
+        'int': workbook.add_format({'num_format': '0', 'border': 1, 'align': 'center', 'valign': 'vcenter'}),
+        'success': workbook.add_format({'bg_color': '#C6EFCE', 'font_color': '#006100', 'border': 1, 'num_format': '0.0%'}),
+        'alert': workbook.add_format({'bg_color': '#FFC7CE', 'font_color': '#9C0006', 'border': 1, 'num_format': '0.0%'}),
+    }
+
+def _accumulate_agents(acc, chunk: pd.DataFrame) -> pd.DataFrame:
+    """Suma al acumulado (índice agent; columnas total, completed) un único groupby del bloque."""
+    grouped = chunk.groupby('agent', observed=True, sort=False)['is_completed'].agg(total='size', completed='sum')
+    return grouped if acc is None else acc.add(grouped, fill_value=0)
+
+def _agent_summary(acc, user_map: dict) -> pd.DataFrame:
+    """
+    Métricas de todos los agentes de una vez: total, completed, not_completed y conversion.
+    Filas en orden alfabético de agente (sin distinguir mayúsculas), como el motor anterior.
+    """
+    cols = ['agent', 'name', 'total', 'completed', 'not_completed', 'conversion']
+    if acc is None or acc.empty:
+        return pd.DataFrame(columns=cols)
+    df = acc.astype(int)
+    df.index = df.index.astype(object)
+    df = df.reset_index().rename(columns={'index': 'agent'})
+    df = df.iloc[df['agent'].astype(str).str.lower().argsort(kind='stable')]
+    df['name'] = df['agent'].map(lambda ag: user_map.get(ag, ag))
+    df['not_completed'] = df['total'] - df['completed']
+    df['conversion'] = (df['completed'] / df['total']).where(df['total'] > 0, 0)
+    return df[cols].reset_index(drop=True)
+
+def _agent_slices(chunk: pd.DataFrame):
+    """
+    (agente, sub-bloque) en una sola pasada: ordenamiento estable por orden de aparición
+    y corte por límites de grupo. Las filas de cada agente conservan su orden original.
+    """
+    codes, uniques = pd.factorize(chunk['agent'])
+    if (np.diff(codes) >= 0).all():
+        # Caso normal: el SQL ya entrega los agentes contiguos, no hace falta reordenar
+        ordered = chunk
+    else:
+        order = codes.argsort(kind='stable')
+        codes, ordered = codes[order], chunk.iloc[order]
+    bounds = np.searchsorted(codes, np.arange(len(uniques) + 1))
+    for i, ag in enumerate(uniques):
+        yield ag, ordered.iloc[bounds[i]:bounds[i + 1]]
+
+# --- Tipo 1: Estratégico (KPIs & Negocio) ---
+
+def _build_strategic(workbook, fmt, chunks, user_map) -> int:
+    ws = workbook.add_worksheet('KPI Global')
+    ws.set_tab_color('#1F4E78')
+    ws_aff = workbook.add_worksheet('Calidad Tráfico')
+    ws_aff.set_tab_color('#8E44AD')
+
+    agent_acc, aff_acc, rows = None, None, 0
+    for chunk in chunks:
+        rows += len(chunk)
+        agent_acc = _accumulate_agents(agent_acc, chunk)
+        pv = chunk.assign(Es_Venta=chunk['is_completed'].astype(int)).pivot_table(
+            index='affiliate', values=['id', 'Es_Venta'], aggfunc={'id': 'count', 'Es_Venta': 'sum'}, observed=True
+        )
+        aff_acc = pv if aff_acc is None else aff_acc.add(pv, fill_value=0)
+
+    # --- HOJA: DASHBOARD GLOBAL ---
+    df_sum = _agent_summary(agent_acc, user_map)[['name', 'total', 'completed', 'conversion']]
+    df_sum.columns = ["AGENTE", "TOTAL", "VENTAS", "CONVERSIÓN"]
+    df_sum = df_sum.sort_values("CONVERSIÓN", ascending=False)
+    ws.set_column('A:A', 25, fmt['cell'])
+    ws.set_column('B:C', 15, fmt['center'])
+    ws.set_column('D:D', 15, fmt['pct'])
+    _write_frame(ws, df_sum, fmt['header'])
+    ws.conditional_format(f'D2:D{len(df_sum)+1}', {'type': 'cell', 'criteria': '>=', 'value': 0.10, 'format': fmt['success']})
+    ws.conditional_format(f'D2:D{len(df_sum)+1}', {'type': 'cell', 'criteria': '<', 'value': 0.05, 'format': fmt['alert']})
+
+    # --- HOJA: CALIDAD AFILIADOS ---
+    if aff_acc is not None:
+        pv_aff = aff_acc.rename(columns={'id': 'TOTAL LEADS', 'Es_Venta': 'VENTAS'})
+        pv_aff = pv_aff[['VENTAS', 'TOTAL LEADS']].astype(int)
+        pv_aff['CONVERSIÓN'] = pv_aff['VENTAS'] / pv_aff['TOTAL LEADS']
+        pv_aff = pv_aff.sort_values('CONVERSIÓN', ascending=False).reset_index()
+        ws_aff.set_column('A:A', 30, fmt['cell'])
+        ws_aff.set_column('B:B', 15, fmt['int'])
+        ws_aff.set_column('C:C', 15, fmt['int'])
+        ws_aff.set_column('D:D', 15, fmt['pct'])
+        _write_frame(ws_aff, pv_aff, fmt['header'])
+    return rows
+
+# --- Tipo 2: Operativo (Desempeño & Detalle) ---
+
+def _build_operational(workbook, fmt, chunks, user_map) -> int:
+    ws_rank = workbook.add_worksheet('Ranking Operativo')
+    ws_rank.set_tab_color('#2980B9')
+
+    detail_cols = ['FECHA', 'ID', 'ETAPA', 'RESULTADO', 'TRANSFERENCIA', 'COMENTARIOS']
+    agent_acc, sheets, rows = None, {}, 0
+    used_names = {'ranking operativo'}
+
+    for chunk in chunks:
+        rows += len(chunk)
+        agent_acc = _accumulate_agents(agent_acc, chunk)
+
+        # Columnas de detalle formateadas una vez por bloque (no por agente)
+        df_detail = pd.DataFrame({
+            'agent': chunk['agent'],
+            'FECHA': _naive_utc(chunk['created_at']).dt.strftime('%Y-%m-%d %H:%M'),
+            'ID': chunk['cordoba_id'],
+            'ETAPA': chunk['info_until'],
+            'RESULTADO': chunk['result'],
+            'TRANSFERENCIA': chunk['transfer_status'],
+            'COMENTARIOS': chunk['comments']
+        })
+
+        # --- HOJAS INDIVIDUALES POR AGENTE (llegan ordenadas por agente) ---
+        for ag, df_ag in _agent_slices(df_detail):
+            if ag not in sheets:
+                ws_ag = workbook.add_worksheet(_sheet_name(user_map.get(ag, ag), used_names))
+                ws_ag.set_column('A:A', 18, fmt['center'])
+                ws_ag.set_column('B:B', 15, fmt['center'])
+                ws_ag.set_column('C:C', 20, fmt['cell'])
+                ws_ag.set_column('D:E', 20, fmt['cell'])
+                ws_ag.set_column('F:F', 60, fmt['cell'])
+                _write_header(ws_ag, detail_cols, fmt['header'])
+                sheets[ag] = [ws_ag, 1]
+
+            ws_ag, next_row = sheets[ag]
+            for values in _rows(df_ag[detail_cols]):
+                ws_ag.write_row(next_row, 0, values)
+                next_row += 1
+            sheets[ag][1] = next_row
+
+    # --- HOJA: RANKING OPERATIVO ---
+    df_rank = _agent_summary(agent_acc, user_map).drop(columns='agent')
+    df_rank.columns = ["AGENTE", "TOTAL GESTIONES", "WC COMPLETED", "WC NOT COMPLETED", "CONVERSIÓN"]
+    df_rank = df_rank.sort_values("WC COMPLETED", ascending=False)
+    ws_rank.set_column('A:A', 30, fmt['cell'])
+    ws_rank.set_column('B:D', 18, fmt['int'])
+    ws_rank.set_column('E:E', 15, fmt['pct'])
+    _write_frame(ws_rank, df_rank, fmt['header'])
+    ws_rank.conditional_format(f'E2:E{len(df_rank)+1}', {'type': 'cell', 'criteria': '>=', 'value': 0.10, 'format': fmt['success']})
+    return rows
+
+# --- Tipo 3: Calidad (Fricción & Errores) ---
+
+def _build_quality(workbook, fmt, chunks) -> int:
+    ws_fun = workbook.add_worksheet('Funnel Caídas')
+    ws_fun.set_tab_color('#C0392B')
+    ws_err = workbook.add_worksheet('Errores Transfer')
+    ws_err.set_tab_color('#D35400')
+    ws_raw = workbook.add_worksheet('Auditoría Full')
+    ws_raw.set_tab_color('#7F7F7F')
+
+    err_cols = ['agent', 'transfer_status', 'comments', 'cordoba_id']
+    ws_err.set_column('A:B', 20, fmt['cell'])
+    ws_err.set_column('C:C', 50, fmt['cell'])
+    _write_header(ws_err, err_cols, fmt['header'])
+    ws_raw.set_column('A:Z', 20, fmt['cell'])
+    _write_header(ws_raw, AUDIT_COLUMNS, fmt['header'])
+
+    funnel, rows, err_row, raw_row = None, 0, 1, 1
+    for chunk in chunks:
+        rows += len(chunk)
+        counts = chunk['info_until'].value_counts()
+        funnel = counts if funnel is None else funnel.add(counts, fill_value=0)
+
+        # --- HOJA: FALLOS TRANSFERENCIA ---
+        mask_fail = chunk['comments'].str.contains('Unsuccessful', case=False, na=False) | \
+                    chunk['comments'].str.contains('Issue:', case=False, na=False) | \
+                    chunk['transfer_status'].str.contains('Unsuccessful', case=False, na=False)
+        for values in _rows(chunk.loc[mask_fail, err_cols]):
+            ws_err.write_row(err_row, 0, values)
+            err_row += 1
+
+        # --- HOJA: AUDITORÍA FULL (LIMPIA) ---
+        df_audit = chunk[AUDIT_COLUMNS].copy()
+        df_audit['created_at'] = _naive_utc(df_audit['created_at']).dt.strftime('%Y-%m-%d %H:%M:%S')
+        for values in _rows(df_audit):
+            ws_raw.write_row(raw_row, 0, values)
+            raw_row += 1
+
+    # --- HOJA: FUNNEL DE CAÍDAS ---
+    if funnel is not None:
+        df_funnel = funnel.astype(int).sort_values(ascending=False).reset_index()
+        df_funnel.columns = ['ETAPA', 'CANTIDAD']
+        df_funnel['%'] = df_funnel['CANTIDAD'] / rows if rows else 0
+        ws_fun.set_column('A:A', 40, fmt['cell'])
+        ws_fun.set_column('B:B', 15, fmt['center'])
+        ws_fun.set_column('C:C', 15, fmt['pct'])
+        _write_frame(ws_fun, df_funnel, fmt['header'])
+        ws_fun.conditional_format(f'B2:B{len(df_funnel)+1}', {'type': 'data_bar', 'bar_color': '#E74C3C'})
+    return rows
+
+# --- API ---
+
+def build_report_file(chunks, user_map: dict, report_type: str, path: str) -> int:
+    """
+    Genera el Excel en `path` consumiendo `chunks` (iterable de DataFrames con LOG_EXPORT_COLUMNS).
+    Retorna la cantidad de filas procesadas; con 0 filas el archivo se elimina.
+    """
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'tmpdir': os.path.dirname(path)})
+    fmt = _formats(workbook)
+    try:
+        if report_type == REPORT_STRATEGIC:
+            rows = _build_strategic(workbook, fmt, chunks, user_map)
+        elif report_type == REPORT_OPERATIONAL:
+            rows = _build_operational(workbook, fmt, chunks, user_map)
+        elif report_type == REPORT_QUALITY:
+            rows = _build_quality(workbook, fmt, chunks)
+        else:
+            raise ValueError(f"Tipo de reporte desconocido: {report_type}")
+    finally:
+        workbook.close()
+
+    if rows == 0 and os.path.exists(path):
+        os.remove(path)
+    return rows
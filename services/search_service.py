@@ -2,6 +2,7 @@ import re
 import pandas as pd
 import streamlit as st
 from sqlalchemy import text  # Necesario para inserts seguros
+import services.metrics_service as metrics_service
 
 # --- Configuración ---
 IGNORED_TOKENS = {"CREDITOR", "ACCOUNT", "BALANCE", "DEBT", "AMOUNT", "TOTAL"}
@@ -16,7 +17,9 @@ def fetch_creditor_master_list(conn) -> pd.DataFrame:
     try:
         # Consultamos directo a la BD sin guardarlo en memoria (cache)
         query = 'SELECT abreviation, name FROM "Creditors" ORDER BY abreviation LIMIT 10000'
-        df = conn.query(query, ttl=0) # ttl=0 asegura datos frescos siempre
+        # Sin TTL cada rerun del Buscador es un miss: la métrica lo deja a la vista
+        with metrics_service.cache_lookup("creditors"):
+            df = conn.query(query, ttl=0) # ttl=0 asegura datos frescos siempre
         
         if not df.empty:
             df = df.rename(columns={"abreviation": "Code", "name": "Name"})
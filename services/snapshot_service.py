@@ -0,0 +1,224 @@
+import os
+import json
+import shutil
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from datetime import date, datetime
+import pytz
+from sqlalchemy import text
+
+from services.archive_service import export_filter_expr, iter_parquet_logs, month_start, add_months
+
+# ==============================================================================
+# SNAPSHOT COLUMNAR DE LOGS (PARQUET, PARTICIONADO POR MES)
+# Logs volcados a SNAPSHOT_DIR/month=YYYY-MM/part-0.parquet (en orden created_at, id) con
+# agent, result y affiliate como diccionario. Los nombres salen del user_map del reporte.
+# Los reportes Estratégico y Calidad leen de aquí (pushdown de mes, fecha y agente) en vez
+# de sacar las filas de Postgres por la red.
+# Lo refresca el job de mantenimiento (services/maintenance_service) o, a mano:
+#   python -m services.snapshot_service [--full]
+# Un mes con una nota editada queda "stale": covers() lo rechaza hasta el próximo refresco.
+# ==============================================================================
+
+# --- Configuración ---
+
+SNAPSHOT_DIR = os.getenv("LOGS_SNAPSHOT_DIR", os.path.join("data", "logs_snapshot"))
+
+MANIFEST_PATH = os.path.join(SNAPSHOT_DIR, "_manifest.json")
+
+TZ_ET = pytz.timezone('US/Eastern')
+
+# Refresco normal: mes actual + el anterior (las ediciones tardías caen casi siempre ahí)
+REFRESH_MONTHS_BACK = 1
+
+_DICT = pa.dictionary(pa.int32(), pa.string())
+
+SNAPSHOT_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("created_at", pa.timestamp("us", tz="UTC")),
+    ("user_id", pa.int64()),
+    ("agent", _DICT),
+    ("cordoba_id", pa.string()),
+    ("result", _DICT),
+    ("is_completed", pa.bool_()),
+    ("affiliate", _DICT),
+    ("comments", pa.string()),
+    ("info_until", pa.string()),
+    ("client_language", pa.string()),
+    ("transfer_status", pa.string()),
+])
+
+SQL_MONTH_ROWS = """
+    SELECT id, created_at, user_id, agent, cordoba_id, result, is_completed, affiliate,
+           comments, info_until, client_language, transfer_status
+    FROM "Logs"
+    WHERE created_at >= :start AND created_at < :end
+    ORDER BY created_at, id
+"""
+
+SQL_FIRST_LOG = 'SELECT MIN(created_at) FROM "Logs"'
+
+# Lectura-modificación-escritura del manifiesto (refresco vs. marcas de meses editados)
+_lock = threading.Lock()
+
+# Un refresco a la vez en el proceso (botón del Admin Panel y job de mantenimiento)
+_build_lock = threading.Lock()
+
+# --- Helpers ---
+
+def _month_dir(month: date) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"month={month:%Y-%m}")
+
+def _month_file(month: date) -> str:
+    return os.path.join(_month_dir(month), "part-0.parquet")
+
+def _month_bounds_utc(month: date):
+    start = pytz.utc.localize(datetime.combine(month, datetime.min.time()))
+    end = pytz.utc.localize(datetime.combine(add_months(month, 1), datetime.min.time()))
+    return start, end
+
+def _write_month(db, month: date, chunksize: int = 50000) -> int:
+    """Escribe el mes en un directorio temporal y lo intercambia por el publicado."""
+    final_dir = _month_dir(month)
+    # Prefijo "_": el descubrimiento de pyarrow ignora estos directorios mientras se escriben
+    tmp_dir = os.path.join(SNAPSHOT_DIR, f"_tmp_month={month:%Y-%m}")
+    old_dir = os.path.join(SNAPSHOT_DIR, f"_old_month={month:%Y-%m}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    start, end = _month_bounds_utc(month)
+    rows = 0
+    sql = text(SQL_MONTH_ROWS).execution_options(stream_results=True)
+    with pq.ParquetWriter(os.path.join(tmp_dir, os.path.basename(_month_file(month))), SNAPSHOT_SCHEMA, compression="zstd") as writer:
+        for chunk in pd.read_sql(sql, db, params={"start": start, "end": end}, chunksize=chunksize):
+            chunk['created_at'] = pd.to_datetime(chunk['created_at'], utc=True)
+            chunk['is_completed'] = chunk['is_completed'].astype(bool)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=SNAPSHOT_SCHEMA, preserve_index=False))
+            rows += len(chunk)
+
+    if os.path.exists(final_dir):
+        os.replace(final_dir, old_dir)
+    os.replace(tmp_dir, final_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return rows
+
+def read_manifest() -> dict:
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_manifest(manifest: dict):
+    tmp = MANIFEST_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, MANIFEST_PATH)
+
+def mark_stale(day: date):
+    """Marca el mes (UTC) de una nota editada: deja de servirse hasta que se reconstruya."""
+    with _lock:
+        manifest = read_manifest()
+        if not manifest.get("built_at"): return
+        manifest.setdefault("stale", {})[f"{day:%Y-%m}"] = datetime.now(pytz.utc).isoformat()
+        _write_manifest(manifest)
+
+# --- Construcción ---
+
+def build_snapshot(conn, full: bool = False) -> dict:
+    """
+    Vuelca Logs a Parquet. Por defecto rehace los últimos meses (REFRESH_MONTHS_BACK)
+    y los marcados como stale; con full=True rehace desde el primer log en Postgres.
+    Retorna el manifiesto actualizado.
+    """
+    with _build_lock:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        built_at = datetime.now(pytz.utc)
+        current = month_start(built_at)
+        manifest = read_manifest()
+
+        with conn.engine.connect() as db:
+            if full or not manifest.get("first_month"):
+                first_log = db.execute(text(SQL_FIRST_LOG)).scalar()
+                # SQLite devuelve el timestamp como texto UTC
+                first = month_start(pd.to_datetime(first_log, utc=True)) if first_log else current
+                stale = []
+            else:
+                first = max(add_months(current, -REFRESH_MONTHS_BACK), date.fromisoformat(manifest["first_month"]))
+                stale = [date.fromisoformat(f"{m}-01") for m in manifest.get("stale", {})]
+
+            months, month = {}, first
+            while month <= current:
+                months[f"{month:%Y-%m}"] = _write_month(db, month)
+                month = add_months(month, 1)
+            for month in stale:
+                if f"{month:%Y-%m}" not in months:
+                    months[f"{month:%Y-%m}"] = _write_month(db, month)
+
+        with _lock:
+            # Se relee: una edición durante el refresco deja su marca (si es posterior a built_at)
+            manifest = read_manifest()
+            manifest.setdefault("months", {}).update(months)
+            if full or not manifest.get("first_month"):
+                manifest["first_month"] = first.isoformat()
+            manifest["built_at"] = built_at.isoformat()
+            manifest["stale"] = {
+                m: edited for m, edited in manifest.get("stale", {}).items()
+                if m not in months or datetime.fromisoformat(edited) >= built_at
+            }
+            _write_manifest(manifest)
+        print(f"[Snapshot] {sum(months.values())} filas en {len(months)} meses -> {SNAPSHOT_DIR}")
+        return manifest
+
+# --- Lectura ---
+
+def covers(start_date, end_date) -> bool:
+    """
+    True si el snapshot tiene el rango completo: desde su primer mes, solo días ET
+    ya cerrados al momento de construirlo (lo de hoy sigue leyéndose de Postgres) y
+    sin meses con notas editadas después del último refresco.
+    """
+    manifest = read_manifest()
+    if not manifest.get("built_at") or not manifest.get("first_month"): return False
+    built_day_et = datetime.fromisoformat(manifest["built_at"]).astimezone(TZ_ET).date()
+    if not (date.fromisoformat(manifest["first_month"]) <= start_date and end_date < built_day_et):
+        return False
+    first, last = f"{month_start(start_date):%Y-%m}", f"{month_start(end_date):%Y-%m}"
+    return not any(first <= m <= last for m in manifest.get("stale", {}))
+
+def _dataset():
+    return ds.dataset(SNAPSHOT_DIR, format="parquet", partitioning="hive")
+
+def _filter(start_date, end_date, target_agent):
+    """Poda de particiones por mes + filtros de fecha/agente del exporte."""
+    months = ds.field("month")
+    return (months >= f"{month_start(start_date):%Y-%m}") & (months <= f"{month_start(end_date):%Y-%m}") & \
+           export_filter_expr(start_date, end_date, target_agent)
+
+def count_snapshot_logs(start_date, end_date, target_agent) -> int:
+    return _dataset().count_rows(filter=_filter(start_date, end_date, target_agent))
+
+def iter_snapshot_logs(start_date, end_date, target_agent, columns, order_by="created_at DESC", chunksize=5000):
+    """
+    Mismo contrato que admin_service.iter_logs_for_export, leyendo del snapshot mes a mes
+    (el más reciente primero) por row groups: memoria acotada como el exporte desde Postgres.
+    """
+    files, month = [], month_start(end_date)
+    while month >= month_start(start_date):
+        if os.path.exists(_month_file(month)):
+            files.append(_month_file(month))
+        month = add_months(month, -1)
+    expr = export_filter_expr(start_date, end_date, target_agent)
+    yield from iter_parquet_logs(files, expr, columns, order_by, chunksize)
+
+# --- Ejecución como Job ---
+
+if __name__ == "__main__":
+    import sys
+    from types import SimpleNamespace
+    from sqlalchemy import create_engine
+
+    build_snapshot(SimpleNamespace(engine=create_engine(os.environ["DATABASE_URL"])), full="--full" in sys.argv)
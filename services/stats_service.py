@@ -0,0 +1,124 @@
+import os
+import pandas as pd
+import pytz
+from datetime import datetime, timedelta
+from sqlalchemy import text
+
+import services.storage as storage
+
+# --- Configuración ---
+
+TZ_ET = pytz.timezone('US/Eastern')
+
+# Días ET que reconstruye el job de mantenimiento (maintenance_service.run_maintenance)
+RECONCILE_DAYS = int(os.getenv("STATS_RECONCILE_DAYS", "7"))
+
+# --- SQL del Rollup (Agent_Daily_Stats) ---
+# Una fila por (agente, día ET, resultado). Inicio lee decenas de filas en vez de miles de notas.
+# {day_L} / {day_L2} / {day}: día ET de created_at según el backend (storage.et_date).
+
+SQL_BUMP_DAILY_STAT = """
+    INSERT INTO "Agent_Daily_Stats" (user_id, day_et, result, total)
+    VALUES (:uid, :day, :res, 1)
+    ON CONFLICT (user_id, day_et, result) DO UPDATE SET total = "Agent_Daily_Stats".total + 1
+"""
+
+SQL_DELETE_LOG_DAY = """
+    DELETE FROM "Agent_Daily_Stats"
+    WHERE EXISTS (
+        SELECT 1 FROM "Logs" L
+        WHERE L.id = :id
+          AND L.user_id = "Agent_Daily_Stats".user_id
+          AND {day_L} = "Agent_Daily_Stats".day_et
+    )
+"""
+
+SQL_REBUILD_LOG_DAY = """
+    INSERT INTO "Agent_Daily_Stats" (user_id, day_et, result, total)
+    SELECT L2.user_id, {day_L2}, L2.result, COUNT(*)
+    FROM "Logs" L
+    JOIN "Logs" L2
+      ON L2.user_id = L.user_id
+     AND {day_L2} = {day_L}
+    WHERE L.id = :id
+    GROUP BY 1, 2, 3
+"""
+
+SQL_DELETE_SINCE = 'DELETE FROM "Agent_Daily_Stats" WHERE day_et >= :day'
+
+SQL_REBUILD_SINCE = """
+    INSERT INTO "Agent_Daily_Stats" (user_id, day_et, result, total)
+    SELECT user_id, {day}, result, COUNT(*)
+    FROM "Logs"
+    WHERE user_id IS NOT NULL AND created_at >= :since
+    GROUP BY 1, 2, 3
+"""
+
+# --- Helpers ---
+
+def et_day(ts: datetime):
+    """Día calendario ET de un timestamp con zona."""
+    return ts.astimezone(TZ_ET).date()
+
+def _et_midnight_utc(day) -> datetime:
+    return TZ_ET.localize(datetime.combine(day, datetime.min.time())).astimezone(pytz.utc)
+
+def _sql(template: str, db) -> str:
+    """Completa los fragmentos de día ET del backend de `db` (sesión, conexión o engine)."""
+    et_date = storage.backend(db).et_date
+    return template.format(day_L=et_date("L.created_at"), day_L2=et_date("L2.created_at"), day=et_date("created_at"))
+
+# --- Escritura (se ejecutan dentro de la sesión del llamador) ---
+
+def bump_daily_stat(session, user_id: int, created_at: datetime, result: str):
+    """Incremento O(1) del rollup; se llama en la misma transacción que el INSERT de la nota."""
+    session.execute(text(SQL_BUMP_DAILY_STAT), {"uid": int(user_id), "day": et_day(created_at), "res": result})
+
+def refresh_log_day(session, log_id: int):
+    """Recalcula el día (agente + fecha ET) de una nota editada."""
+    params = {"id": int(log_id)}
+    session.execute(text(_sql(SQL_DELETE_LOG_DAY, session)), params)
+    session.execute(text(_sql(SQL_REBUILD_LOG_DAY, session)), params)
+
+def rebuild_since(db, since):
+    """Re-inserta el rollup desde `since` (UTC) agrupando Logs. El llamador borra antes y confirma."""
+    db.execute(text(_sql(SQL_REBUILD_SINCE, db)), {"since": since})
+
+# --- Job de Reconstrucción ---
+
+def rebuild_daily_stats(conn, days_back: int = RECONCILE_DAYS) -> bool:
+    """
+    Reconstruye el rollup de los últimos `days_back` días ET desde Logs.
+    Reconciliación periódica (la corre el job de mantenimiento): repara ediciones hechas
+    por SQL a mano; el incremento en commit_log mantiene el día al instante.
+    """
+    if not conn: return False
+    since_day = datetime.now(TZ_ET).date() - timedelta(days=days_back)
+    try:
+        # Directo al engine: también corre desde el hilo de mantenimiento y fuera de Streamlit
+        with conn.engine.begin() as db:
+            db.execute(text(SQL_DELETE_SINCE), {"day": since_day})
+            rebuild_since(db, _et_midnight_utc(since_day))
+        return True
+    except Exception as e:
+        print(f"[Stats Rebuild Error] {e}")
+        return False
+
+# --- Lectura ---
+
+def fetch_agent_daily_stats(conn, user_id: int, start_day) -> pd.DataFrame:
+    """Filas pre-agregadas (day_et, result, is_completed, result_reason, total) desde `start_day` (ET)."""
+    if not conn or user_id is None: return pd.DataFrame()
+    try:
+        query = """
+            SELECT day_et, result, is_completed, result_reason, total FROM "Agent_Daily_Stats"
+            WHERE user_id = :uid AND day_et >= :day
+        """
+        df = conn.query(query, params={"uid": int(user_id), "day": start_day}, ttl=0)
+        if not df.empty:
+            df['day_et'] = pd.to_datetime(df['day_et']).dt.date
+            df['is_completed'] = df['is_completed'].astype(bool)
+        return df
+    except Exception as e:
+        print(f"[Stats Fetch Error] {e}")
+        return pd.DataFrame()
@@ -0,0 +1,191 @@
+import os
+import json
+import sqlite3
+import threading
+import pytz
+from datetime import date, datetime
+from sqlalchemy import event
+
+# ==============================================================================
+# BACKEND DE ALMACENAMIENTO (POSTGRES / SQLITE EMBEBIDO)
+# Los servicios escriben SQL portable y piden aquí solo los fragmentos que cambian de un
+# motor a otro (ILIKE, día ET, listas enlazadas, texto completo, COPY).
+#   DATABASE_URL=postgresql://...          -> Postgres (Docker, esquema en init.sql)
+#   DATABASE_URL=sqlite:///data/cordoba.db -> SQLite en modo WAL (esquema en init_sqlite.sql,
+#                                             se crea solo): pruebas, benchmarks y sitios chicos
+# Esquema a mano:  python -m services.storage
+# ==============================================================================
+
+# --- Configuración ---
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCHEMA_FILES = {"postgresql": "init.sql", "sqlite": "init_sqlite.sql"}
+
+TZ_ET = pytz.timezone('US/Eastern')
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Mismo formato que el DEFAULT de init_sqlite.sql: UTC, ordenable como texto
+SQLITE_TS_FORMAT = "%Y-%m-%d %H:%M:%S.%f+00:00"
+
+# --- Backends ---
+
+class PostgresBackend:
+    name = "postgresql"
+    supports_copy = True
+
+    def ilike(self, expr: str, param: str) -> str:
+        return f"{expr} ILIKE {param}"
+
+    def et_date(self, expr: str) -> str:
+        """Día calendario ET de un timestamptz."""
+        return f"({expr} AT TIME ZONE 'US/Eastern')::date"
+
+    def int_list(self, param: str) -> str:
+        """Subconsulta con los enteros de una lista enlazada (usar con bind_list)."""
+        return f"SELECT unnest(CAST({param} AS INT[]))"
+
+    def json_rows(self, param: str, columns: dict, alias: str = "R") -> str:
+        """Fuente de filas (FROM) desde una lista de dicts enlazada con bind_rows."""
+        cols = ", ".join(f"{c} {t}" for c, t in columns.items())
+        return f"jsonb_to_recordset(CAST({param} AS jsonb)) AS {alias}({cols})"
+
+    def bind_list(self, values) -> list:
+        return [int(v) for v in values]
+
+    def bind_rows(self, rows) -> str:
+        # Fechas como texto UTC: Postgres lo castea a timestamptz y SQLite lo guarda tal cual
+        return json.dumps(list(rows), default=_json_default)
+
+    def prefix_query(self, terms: list) -> str:
+        """'pago tard' -> 'pago:* & tard:*' (coincide mientras se escribe)."""
+        return " & ".join(f"{t}:*" for t in terms)
+
+    def updates_match(self, alias: str, param: str) -> str:
+        return f"{alias}.search_tsv @@ to_tsquery('simple', {param})"
+
+    def updates_rank(self, alias: str, param: str) -> str:
+        return f"ts_rank_cd({alias}.search_tsv, to_tsquery('simple', {param}))"
+
+class SQLiteBackend(PostgresBackend):
+    name = "sqlite"
+    supports_copy = False
+
+    def ilike(self, expr: str, param: str) -> str:
+        # LIKE de SQLite ya ignora mayúsculas (ASCII); el escape de _escape_like es '\'
+        return f"{expr} LIKE {param} ESCAPE '\\'"
+
+    def et_date(self, expr: str) -> str:
+        return f"et_date({expr})"
+
+    def int_list(self, param: str) -> str:
+        return f"SELECT value FROM json_each({param})"
+
+    def json_rows(self, param: str, columns: dict, alias: str = "R") -> str:
+        cols = ", ".join(f"json_extract(value, '$.{c}') AS {c}" for c in columns)
+        return f"(SELECT {cols} FROM json_each({param})) AS {alias}"
+
+    def bind_list(self, values) -> str:
+        return json.dumps([int(v) for v in values])
+
+    def prefix_query(self, terms: list) -> str:
+        # Sintaxis FTS5: términos entre comillas con '*' de prefijo, AND implícito
+        return " ".join(f'"{t}"*' for t in terms)
+
+    def updates_match(self, alias: str, param: str) -> str:
+        return f'{alias}.id IN (SELECT rowid FROM "Updates_fts" WHERE "Updates_fts" MATCH {param})'
+
+    def updates_rank(self, alias: str, param: str) -> str:
+        # bm25: menor es mejor; pesos título/mensaje como setweight A/B de Postgres
+        return f"""COALESCE((SELECT -bm25("Updates_fts", 1.0, 0.4) FROM "Updates_fts"
+                             WHERE "Updates_fts" MATCH {param} AND rowid = {alias}.id), 0)"""
+
+_BACKENDS = {"postgresql": PostgresBackend(), "sqlite": SQLiteBackend()}
+
+def backend(db):
+    """Backend de un st.connection, Engine, Connection o Session de SQLAlchemy."""
+    if hasattr(db, "get_bind"):
+        db = db.get_bind()
+    engine = getattr(db, "engine", db)
+    return _BACKENDS[engine.dialect.name]
+
+# --- SQLite: tipos y funciones ---
+
+def _adapt_datetime(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = pytz.utc.localize(value)
+    return value.astimezone(pytz.utc).strftime(SQLITE_TS_FORMAT)
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_adapter(date, date.isoformat)
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return _adapt_datetime(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} no serializable en bind_rows")
+
+def _et_date(value):
+    """et_date(ts) en SQLite: mismo resultado que (ts AT TIME ZONE 'US/Eastern')::date."""
+    if value is None: return None
+    ts = datetime.fromisoformat(str(value))
+    if ts.tzinfo is None:
+        ts = pytz.utc.localize(ts)
+    return ts.astimezone(TZ_ET).date().isoformat()
+
+def _on_sqlite_connect(dbapi_conn, _record):
+    dbapi_conn.create_function("et_date", 1, _et_date, deterministic=True)
+    for pragma in SQLITE_PRAGMAS:
+        dbapi_conn.execute(pragma)
+
+# --- Esquema ---
+
+_lock = threading.Lock()
+_prepared = set()
+
+def create_schema(engine):
+    """Aplica el archivo de esquema del motor (init.sql / init_sqlite.sql). Ambos son idempotentes."""
+    name = backend(engine).name
+    with open(os.path.join(ROOT, SCHEMA_FILES[name]), encoding="utf-8") as f:
+        sql = f.read()
+    raw = engine.raw_connection()
+    try:
+        if name == "sqlite":
+            raw.driver_connection.executescript(sql)
+        else:
+            raw.cursor().execute(sql)
+        raw.commit()
+    finally:
+        raw.close()
+
+def prepare_engine(engine):
+    """
+    Ajustes por motor, una vez por engine. SQLite: pragmas WAL + funciones en cada conexión
+    y esquema creado si falta. Postgres: nada (el esquema lo aplica Docker con init.sql).
+    """
+    with _lock:
+        if id(engine) in _prepared: return
+        _prepared.add(id(engine))
+        if backend(engine).name != "sqlite": return
+        event.listen(engine, "connect", _on_sqlite_connect)
+        # Conexiones abiertas antes del listener (no debería haber) no tendrían et_date
+        engine.dispose()
+        create_schema(engine)
+
+# --- Ejecución como Job ---
+
+if __name__ == "__main__":
+    from sqlalchemy import create_engine
+
+    db_engine = create_engine(os.environ["DATABASE_URL"])
+    prepare_engine(db_engine)
+    if backend(db_engine).name != "sqlite":
+        create_schema(db_engine)
+    print(f"[Storage] Esquema aplicado ({backend(db_engine).name})")
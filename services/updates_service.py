@@ -1,6 +1,13 @@
+import re
+import atexit
+import threading
 import pandas as pd
 from sqlalchemy import text
 from conexion import get_db_connection
+import services.storage as storage
+from services.records import UPDATE_COLUMNS, select_list
+
+UPDATES_PAGE_SIZE = 20
 
 def fetch_updates(conn) -> pd.DataFrame:
     """Obtiene los mensajes activos ordenados por fecha."""
@@ -8,12 +15,56 @@ def fetch_updates(conn) -> pd.DataFrame:
     
     try:
         # ttl=0 para asegurar que si lanzas una alerta, salga YA.
-        query = 'SELECT * FROM "Updates" WHERE active = TRUE ORDER BY date DESC'
+        query = f'SELECT {select_list(UPDATE_COLUMNS)} FROM "Updates" WHERE active = TRUE ORDER BY date DESC'
         return conn.query(query, ttl=0)
     except Exception as e:
         print(f"[Updates Fetch Error] {e}")
         return pd.DataFrame()
 
+def rerun_updates(conn, state) -> pd.DataFrame:
+    """
+    Noticias activas ya leídas en este rerun por la alarma global (se consumen una vez);
+    si no están (rerun de fragmento, alarma con error) se consultan de nuevo.
+    """
+    df = state.pop(RERUN_UPDATES_KEY, None)
+    return df if df is not None else fetch_updates(conn)
+
+def _search_terms(term: str) -> list:
+    """Palabras del término (ignora la sintaxis de tsquery / FTS5 que se teclee)."""
+    return re.findall(r"[^\W_]+", term.lower())
+
+def search_updates(conn, term: str, include_archived: bool = False, page: int = 1, page_size: int = UPDATES_PAGE_SIZE):
+    """
+    Una página de noticias que coinciden con `term` (texto completo sobre título + mensaje,
+    GIN de init.sql o FTS5 en SQLite), ordenadas por relevancia. Sin término: todas por fecha.
+    Con include_archived también busca en las archivadas. Retorna (DataFrame, total).
+    """
+    if not conn: return pd.DataFrame(), 0
+    db = storage.backend(conn)
+    terms = _search_terms(term or "")
+    query_text = db.prefix_query(terms) if terms else ""
+    match = db.updates_match("N", ":q") if terms else "TRUE"
+    rank = db.updates_rank("N", ":q") if terms else "0"
+    sql = f"""
+        SELECT {select_list(UPDATE_COLUMNS, "N")}, N.active, COUNT(*) OVER () AS total_count
+        FROM "Updates" N
+        WHERE {match} AND (N.active OR :archived)
+        ORDER BY {rank} DESC, N.date DESC, N.id DESC
+        LIMIT :limit OFFSET :offset
+    """
+    page = max(int(page), 1)
+    params = {"q": query_text, "archived": include_archived, "limit": page_size, "offset": (page - 1) * page_size}
+    try:
+        df = conn.query(sql, params=params, ttl=0)
+        if df.empty and page > 1:
+            # Página fuera de rango: volvemos a la primera
+            return search_updates(conn, term, include_archived, 1, page_size)
+        total = int(df.iloc[0]['total_count']) if not df.empty else 0
+        return df.drop(columns=['total_count']), total
+    except Exception as e:
+        print(f"[Updates Search Error] {e}")
+        return pd.DataFrame(), 0
+
 def fetch_read_ids(conn, username: str) -> list:
     """
     Retorna una lista simple de los IDs que este usuario ya marcó.
@@ -32,21 +83,145 @@ def fetch_read_ids(conn, username: str) -> list:
         print(f"[Reads Fetch Error] {e}")
         return []
 
+# --- Confirmaciones de Lectura ---
+# Los clicks se acumulan en un buffer del proceso y se escriben juntos (un INSERT por flush);
+# la sesión actualiza su set de leídos en memoria al instante, sin re-consultar.
+# Si un flush falla, esas lecturas se reintentan y mientras tanto session_read_ids no las
+# cuenta como leídas: badge y lista no dicen "leído" algo que la BD todavía no tiene.
+
+FLUSH_SECONDS = 2.0
+FLUSH_MAX_PENDING = 200
+
+FLUSH_RETRY_SECONDS = 30
+
+SESSION_READS_KEY = "updates_read_ids"
+
+# Noticias activas que trajo la alarma de main.py en este rerun (la vista Novedades las reutiliza)
+RERUN_UPDATES_KEY = "updates_rerun_active"
+
+# {reads} / {ids}: fragmentos del backend (lista enlazada como array en Postgres, JSON en SQLite).
+# "WHERE TRUE": SQLite exige un WHERE en INSERT ... SELECT con ON CONFLICT
+SQL_INSERT_READS = """
+    INSERT INTO "Updates_Reads" (update_id, username)
+    SELECT R.update_id, R.username
+    FROM {reads}
+    JOIN "Updates" N ON N.id = R.update_id
+    WHERE TRUE
+    ON CONFLICT (update_id, username) DO NOTHING
+"""
+
+SQL_MARK_PENDING = """
+    INSERT INTO "Updates_Reads" (update_id, username)
+    SELECT N.id, :user FROM "Updates" N
+    WHERE N.active = TRUE AND (:all OR N.id IN ({ids}))
+    ON CONFLICT (update_id, username) DO NOTHING
+    RETURNING update_id
+"""
+
+class _ReadBuffer:
+    def __init__(self):
+        self.pending = set()     # (update_id, username)
+        self.failed = set()      # (update_id, username) con un flush fallido, aún sin escribir
+        # El último conn que encoló: st.connection está cacheado por proceso (get_db_connection),
+        # todas las sesiones pasan el mismo objeto, así que el flush usa siempre el mismo engine
+        self.conn = None
+        self.timer = None
+        self.lock = threading.Lock()
+
+_buffer = _ReadBuffer()
+
+def flush_reads() -> int:
+    """Escribe todas las lecturas pendientes en un solo INSERT. Retorna cuántas se enviaron."""
+    with _buffer.lock:
+        batch, conn = _buffer.pending, _buffer.conn
+        _buffer.pending, _buffer.timer = set(), None
+    if not batch or not conn: return 0
+
+    db = storage.backend(conn)
+    sql = SQL_INSERT_READS.format(reads=db.json_rows(":reads", {"update_id": "INT", "username": "TEXT"}))
+    rows = db.bind_rows({"update_id": i, "username": u} for i, u in batch)
+    try:
+        with conn.session as session:
+            session.execute(text(sql), {"reads": rows})
+            session.commit()
+        with _buffer.lock:
+            _buffer.failed -= batch
+        return len(batch)
+    except Exception as e:
+        print(f"[Mark Read Error] {e}")
+        # Se reintentan más tarde; hasta entonces las sesiones no las muestran como leídas
+        with _buffer.lock:
+            _buffer.pending |= batch
+            _buffer.failed |= batch
+            if _buffer.timer is None:
+                _buffer.timer = threading.Timer(FLUSH_RETRY_SECONDS, flush_reads)
+                _buffer.timer.daemon = True
+                _buffer.timer.start()
+        return 0
+
+atexit.register(flush_reads)
+
 def mark_as_read(conn, update_id: int, username: str) -> bool:
-    """Escribe en la base de datos que el usuario leyó la noticia."""
+    """Encola la lectura; se escribe junto con las demás en <= FLUSH_SECONDS."""
     if not conn or not username: return False
-    
+
+    flush_now = False
+    with _buffer.lock:
+        _buffer.pending.add((int(update_id), username))
+        _buffer.conn = conn
+        if len(_buffer.pending) >= FLUSH_MAX_PENDING:
+            flush_now = True
+        elif _buffer.timer is None:
+            _buffer.timer = threading.Timer(FLUSH_SECONDS, flush_reads)
+            _buffer.timer.daemon = True
+            _buffer.timer.start()
+    if flush_now:
+        flush_reads()
+    return True
+
+def mark_many_as_read(conn, username: str, update_ids=None) -> list:
+    """
+    Marca como leídas varias noticias activas (o todas las pendientes si update_ids es None)
+    en un solo INSERT ... SELECT. Retorna los IDs recién marcados.
+    """
+    if not conn or not username: return []
+    db = storage.backend(conn)
+    sql = SQL_MARK_PENDING.format(ids=db.int_list(":ids"))
+    params = {"user": username, "all": update_ids is None, "ids": db.bind_list(update_ids or [])}
     try:
-        # ON CONFLICT DO NOTHING evita errores si le dan click doble muy rápido
-        sql = """
-            INSERT INTO "Updates_Reads" (update_id, username) 
-            VALUES (:uid, :user)
-            ON CONFLICT (update_id, username) DO NOTHING
-        """
         with conn.session as session:
-            session.execute(text(sql), {"uid": update_id, "user": username})
+            rows = session.execute(text(sql), params).fetchall()
             session.commit()
-        return True
+        return [r[0] for r in rows]
     except Exception as e:
         print(f"[Mark Read Error] {e}")
-        return False
\ No newline at end of file
+        return []
+
+# --- Caché de Leídos por Sesión ---
+
+def _failed_reads(username: str) -> set:
+    """IDs del usuario cuyo flush falló y todavía no están en la BD."""
+    with _buffer.lock:
+        return {i for i, u in _buffer.failed if u == username}
+
+def session_read_ids(conn, username: str, state) -> set:
+    """
+    IDs leídos del usuario guardados en `state` (st.session_state): una consulta por sesión.
+    Excluye las lecturas con flush fallido (vuelven a contar cuando el reintento las escribe).
+    """
+    cached = state.get(SESSION_READS_KEY)
+    if cached is None or cached[0] != username:
+        cached = (username, set(fetch_read_ids(conn, username)))
+        state[SESSION_READS_KEY] = cached
+    failed = _failed_reads(username)
+    return cached[1] - failed if failed else cached[1]
+
+def remember_reads(state, username: str, update_ids):
+    """Suma IDs al set de la sesión (tras marcar) sin volver a la BD."""
+    cached = state.get(SESSION_READS_KEY)
+    if cached and cached[0] == username:
+        cached[1].update(int(i) for i in update_ids)
+
+def forget_reads(state):
+    """Descarta el set de la sesión (botón refrescar): se recarga en el próximo acceso."""
+    state.pop(SESSION_READS_KEY, None)
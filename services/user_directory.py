@@ -0,0 +1,157 @@
+import time
+import threading
+
+import services.metrics_service as metrics_service
+from services.records import USER_AUTH_COLUMNS, UserRecord, select_list
+
+# ==============================================================================
+# DIRECTORIO DE USUARIOS EN MEMORIA (COMPARTIDO POR EL PROCESO)
+# "Users" se carga una vez y se sirve desde memoria por username e id: reconexión por
+# cookie, login, mapa de nombres de reportes, lista de agentes y gestor de usuarios.
+# create_user / update_user_profile / update_credentials refrescan solo la fila tocada.
+# El hash de contraseña queda adentro: solo auth_for() lo entrega (login y cambio de clave).
+# ==============================================================================
+
+# --- Configuración ---
+
+# Recarga completa de respaldo: cambios hechos fuera de la app (migrar_datos --sync, psql)
+RESYNC_SECONDS = 600
+
+# --- SQL ---
+
+SQL_ALL_USERS = f'SELECT {select_list(USER_AUTH_COLUMNS)} FROM "Users"'
+
+SQL_USER_BY_USERNAME = SQL_ALL_USERS + ' WHERE username = :u'
+
+SQL_USER_BY_ID = SQL_ALL_USERS + ' WHERE id = :id'
+
+# --- Estado ---
+
+class _Directory:
+    def __init__(self):
+        self.by_username = {}    # username -> dict (USER_AUTH_COLUMNS)
+        self.by_id = {}          # id -> username
+        self.loaded_at = 0.0
+        self.stale = True
+
+_state = _Directory()
+_lock = threading.Lock()
+
+# --- Helpers ---
+
+def _row(user: dict) -> dict:
+    user = dict(user)
+    user['id'] = int(user['id'])
+    user['active'] = bool(user['active']) if user['active'] is not None else True
+    return user
+
+def _public(user: dict) -> dict:
+    return {k: v for k, v in user.items() if k != 'password'}
+
+def _put(user: dict):
+    old = _state.by_username.get(user['username'])
+    if old and old['id'] != user['id']:
+        _state.by_id.pop(old['id'], None)
+    _state.by_username[user['username']] = user
+    _state.by_id[user['id']] = user['username']
+
+def _drop(username: str = None, user_id: int = None):
+    if username is None:
+        username = _state.by_id.get(user_id)
+    user = _state.by_username.pop(username, None)
+    if user:
+        _state.by_id.pop(user['id'], None)
+
+def _load_all(conn):
+    df = conn.query(SQL_ALL_USERS, ttl=0)
+    _state.by_username, _state.by_id = {}, {}
+    for user in df.to_dict('records'):
+        _put(_row(user))
+    _state.loaded_at = time.time()
+    _state.stale = False
+
+def _ensure(conn):
+    """Carga (o recarga de respaldo) bajo el lock. Retorna False si no hubo forma de cargar."""
+    try:
+        with metrics_service.cache_lookup("users"):
+            if _state.stale or time.time() - _state.loaded_at > RESYNC_SECONDS:
+                _load_all(conn)
+        return True
+    except Exception as e:
+        print(f"[User Directory Error] {e}")
+        _state.stale = True
+        return False
+
+def _fetch_one(conn, username: str = None, user_id: int = None):
+    """Lee una sola fila de la BD y la guarda (o la quita si ya no existe)."""
+    if username is not None:
+        df = conn.query(SQL_USER_BY_USERNAME, params={"u": username}, ttl=0)
+    else:
+        df = conn.query(SQL_USER_BY_ID, params={"id": int(user_id)}, ttl=0)
+    if df.empty:
+        _drop(username, user_id)
+        return None
+    user = _row(df.iloc[0].to_dict())
+    _put(user)
+    return user
+
+# --- Lecturas ---
+
+def get_user(conn, username: str):
+    """Usuario (sin hash) por username, o None. Read-through: un username desconocido se busca en la BD."""
+    if not conn or not username: return None
+    with _lock:
+        if not _ensure(conn): return None
+        user = _state.by_username.get(username)
+        if user is None:
+            try:
+                user = _fetch_one(conn, username=username)
+            except Exception as e:
+                print(f"[User Directory Error] {e}")
+                return None
+        return _public(user) if user else None
+
+def auth_for(conn, username: str):
+    """Usuario con hash de contraseña (solo para verificar credenciales)."""
+    if not conn or not username: return None
+    with _lock:
+        if not _ensure(conn): return None
+        user = _state.by_username.get(username)
+        if user is None:
+            user = _fetch_one(conn, username=username)
+        return dict(user) if user else None
+
+def user_map(conn) -> dict:
+    """{username: nombre} de todos los usuarios."""
+    with _lock:
+        if not conn or not _ensure(conn): return {}
+        return {u: user['name'] for u, user in _state.by_username.items()}
+
+def agent_list(conn) -> list:
+    """Usernames activos, ordenados."""
+    with _lock:
+        if not conn or not _ensure(conn): return []
+        return sorted(u for u, user in _state.by_username.items() if user['active'])
+
+def all_users(conn) -> list:
+    """Lista de UserRecord (sin hash) ordenada por username."""
+    with _lock:
+        if not conn or not _ensure(conn): return []
+        return [UserRecord(*(user[f] for f in UserRecord._fields)) for _, user in sorted(_state.by_username.items())]
+
+# --- Invalidación (la llaman las escrituras sobre "Users") ---
+
+def refresh_user(conn, username: str = None, user_id: int = None):
+    """Vuelve a leer solo la fila cambiada. Si falla, fuerza recarga completa en la próxima lectura."""
+    with _lock:
+        if _state.stale: return
+        try:
+            _fetch_one(conn, username=username, user_id=user_id)
+        except Exception as e:
+            print(f"[User Directory Error] {e}")
+            _state.stale = True
+
+def invalidate():
+    """Recarga completa en el próximo acceso."""
+    with _lock:
+        _state.stale = True
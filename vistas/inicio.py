@@ -12,71 +12,26 @@ try:
 except ImportError:
     from conexion import get_db_connection
 
-# --- Configuration & Constants ---
+import services.calendar_service as calendar_service
+import services.stats_service as stats_service
+from services.records import UPDATE_COLUMNS, select_list
 
-US_HOLIDAYS_2025 = {
-    (1, 1), (5, 26), (9, 1), (11, 27), (12, 25)
-}
+# --- Configuration & Constants ---
 
 TZ_ET = pytz.timezone('US/Eastern')
 TZ_BO = pytz.timezone('America/La_Paz')
 TZ_CO = pytz.timezone('America/Bogota')
 
-# --- Business Logic (Dates) ---
-
-def _is_holiday(date_obj) -> bool:
-    return (date_obj.month, date_obj.day) in US_HOLIDAYS_2025
-
-def calculate_business_date(start_date, target_days):
-    """Calculates future business date skipping weekends and US holidays."""
-    current_date = start_date
-    days_counted = 0
-    
-    while days_counted < target_days:
-        is_weekend = current_date.weekday() >= 5
-        is_holiday = _is_holiday(current_date)
-        
-        if not is_weekend and not is_holiday:
-            days_counted += 1
-            if days_counted == target_days:
-                return current_date
-        
-        current_date += timedelta(days=1)
-            
-    return current_date
-
 # --- Data Layer (SQL Version) ---
 
 def fetch_active_news(conn) -> pd.DataFrame:
     if not conn: return pd.DataFrame()
     try:
-        query = 'SELECT * FROM "Updates" WHERE active = TRUE ORDER BY date DESC'
+        query = f'SELECT {select_list(UPDATE_COLUMNS)} FROM "Updates" WHERE active = TRUE ORDER BY date DESC'
         return conn.query(query, ttl=60)
     except Exception:
         return pd.DataFrame()
 
-def fetch_agent_metrics(conn, agent_name: str, start_date_utc: str) -> pd.DataFrame:
-    if not conn: return pd.DataFrame()
-    try:
-        # CORRECCIÓN ROBUSTA:
-        # 1. Usamos string normal (sin text()) para evitar errores de cache.
-        # 2. Usamos TRIM() y LOWER() para ignorar espacios y mayúsculas.
-        # 3. Casteamos created_at para asegurar comparación correcta.
-        query = """
-            SELECT * FROM "Logs" 
-            WHERE LOWER(TRIM(agent)) = :agent 
-            AND created_at >= :start_date 
-            ORDER BY created_at DESC
-        """
-        
-        # Limpiamos el input también
-        clean_agent = agent_name.strip().lower()
-        
-        return conn.query(query, params={"agent": clean_agent, "start_date": start_date_utc}, ttl=0)
-    except Exception as e:
-        print(f"Error metrics: {e}") # Log para debug en consola Docker
-        return pd.DataFrame()
-
 # --- UI Components ---
 
 def render_clock_widget():
@@ -103,8 +58,6 @@ def show():
     
     start_of_week = today - timedelta(days=today.weekday())
     start_of_month = today.replace(day=1)
-    
-    start_of_month_utc = datetime.combine(start_of_month, datetime.min.time()).replace(tzinfo=TZ_ET).astimezone(pytz.utc).isoformat()
 
     agent_name = st.session_state.get("username")
     if not agent_name:
@@ -122,8 +75,9 @@ def show():
 
     # 3. Date Calculator Module
     st.subheader("📅 First Payment Dates")
-    date_std = calculate_business_date(now_et, 3) 
-    date_ext = calculate_business_date(now_et, 5)  
+    # Calendario hábil precalculado y cacheado por día ET (services/calendar_service)
+    date_std = calendar_service.add_business_days(now_et, 3) 
+    date_ext = calendar_service.add_business_days(now_et, 5)  
     date_max = now_et + timedelta(days=35)
 
     cols = st.columns(3)
@@ -143,25 +97,27 @@ def show():
 
     st.write("") 
 
-    # 4. Performance Dashboard
-    df_logs = fetch_agent_metrics(conn, agent_name, start_of_month_utc)
-    
-    if not df_logs.empty and 'created_at' in df_logs.columns:
-        df_logs['created_at'] = pd.to_datetime(df_logs['created_at'], utc=True)
-        df_logs['date_et'] = df_logs['created_at'].dt.tz_convert(TZ_ET).dt.date
+    # 4. Performance Dashboard (rollup pre-agregado: una fila por día ET y resultado)
+    # Desde el inicio de semana o de mes (el que sea anterior) para que "This Week" no se corte
+    df_stats = stats_service.fetch_agent_daily_stats(
+        conn, st.session_state.get("user_id"), min(start_of_week, start_of_month)
+    )
         
     st.subheader("📊 Performance Tracker")
     tabs = st.tabs(["📅 Today", "🗓️ This Week", "🏆 This Month"])
 
     def _render_tab_metrics(filter_date, tag):
-        if df_logs.empty:
-            subset = pd.DataFrame(columns=['result'])
+        if df_stats.empty:
+            subset = pd.DataFrame(columns=['result', 'is_completed', 'result_reason', 'total'])
         else:
-            subset = df_logs[df_logs['date_et'] >= filter_date].copy()
+            subset = df_stats[df_stats['day_et'] >= filter_date]
         
-        total_interactions = len(subset)
-        completed_df = subset[subset['result'].str.contains('Completed', case=False, na=False) & ~subset['result'].str.contains('Not', case=False, na=False)]
-        sales_count = len(completed_df)
+        # Consolidamos los días del periodo: una fila por resultado (clasificación ya viene de la BD)
+        subset = subset.groupby(['result', 'is_completed', 'result_reason'], as_index=False, dropna=False)['total'].sum()
+        subset['Status'] = subset['is_completed'].map({True: 'Completed', False: 'Not Completed'})
+
+        total_interactions = int(subset['total'].sum())
+        sales_count = int(subset.loc[subset['is_completed'] == True, 'total'].sum())
         conversion_rate = (sales_count / total_interactions * 100) if total_interactions > 0 else 0
 
         k1, k2, k3 = st.columns(3)
@@ -175,27 +131,25 @@ def show():
             c_donut, c_fail = st.columns([1, 1])
             with c_donut:
                 st.markdown("###### 🟢 Success vs Failure")
-                subset['Status'] = subset['result'].apply(lambda x: 'Completed' if 'Completed' in x and 'Not' not in x else 'Not Completed')
-                base = alt.Chart(subset).encode(theta=alt.Theta("count()", stack=True))
+                base = alt.Chart(subset).encode(theta=alt.Theta("sum(total):Q", stack=True))
                 pie = base.mark_arc(outerRadius=80, innerRadius=45).encode(
                     color=alt.Color("Status", scale=alt.Scale(domain=['Completed', 'Not Completed'], range=['#2ecc71', '#e74c3c']), legend=None),
-                    tooltip=["Status", "count()"]
+                    tooltip=["Status", "sum(total):Q"]
                 )
                 text = base.mark_text(radius=100).encode(
-                    text="count()", order=alt.Order("Status"), color=alt.value("black")  
+                    text="sum(total):Q", order=alt.Order("Status"), color=alt.value("black")  
                 )
                 st.altair_chart(pie + text, use_container_width=True)
 
             with c_fail:
-                failures = subset[subset['Status'] == 'Not Completed']
+                failures = subset[subset['is_completed'] == False].rename(columns={'result_reason': 'Reason'})
                 if not failures.empty:
                     st.markdown("###### 🔴 Why Not Completed?")
-                    failures['Reason'] = failures['result'].str.replace('Not Completed - ', '', regex=False)
                     fail_chart = alt.Chart(failures).mark_bar().encode(
-                        x=alt.X('count()', title=None),
+                        x=alt.X('sum(total):Q', title=None),
                         y=alt.Y('Reason', sort='-x', title=None),
                         color=alt.value('#e74c3c'),
-                        tooltip=['Reason', 'count()']
+                        tooltip=['Reason', 'sum(total):Q']
                     ).properties(height=180)
                     st.altair_chart(fail_chart, use_container_width=True)
                 elif total_interactions > 0:
@@ -1,5 +1,6 @@
 import time
 import re
+import pandas as pd
 import streamlit as st
 import streamlit.components.v1 as components
 from datetime import datetime
@@ -33,18 +34,6 @@ TRANSFER_FAIL_REASONS = [
 # 1. UTILS & HELPERS
 # ==============================================================================
 
-def _is_duplicate_submission(record_id: str, cooldown: int = 60) -> bool:
-    now = time.time()
-    if "last_save_time" in st.session_state:
-        elapsed = now - st.session_state.last_save_time
-        if elapsed < cooldown and st.session_state.get("last_save_id") == record_id:
-            return True
-    return False
-
-def _register_successful_save(record_id: str):
-    st.session_state.last_save_time = time.time()
-    st.session_state.last_save_id = record_id
-
 def _inject_copy_button(text_content: str, unique_key: str):
     if not text_content: return
     safe_text = (text_content.replace("\\", "\\\\").replace("`", "\\`").replace("$", "\\$").replace("{", "\\{").replace("}", "\\}"))
@@ -232,15 +221,43 @@ def render_confirm_modal(conn, payload: dict):
         st.rerun()
     if col_ok.button("✅ Confirm & Save", type="primary", use_container_width=True):
         try:
+            # La deduplicación la garantiza la BD (clave de idempotencia), no la sesión
             if note_service.commit_log(conn, payload):
-                _register_successful_save(payload['cordoba_id'])
                 st.balloons()
                 st.toast("Saved successfully!", icon="💾")
                 time.sleep(1.0)
                 st.rerun()
+            else:
+                st.warning(f"⚠️ Duplicate for ID {payload['cordoba_id']} (already saved).")
         except Exception as e:
             st.error(f"Error saving: {e}")
 
+def _render_history(conn, user_id):
+    """
+    Historial paginado por keyset. La página más reciente se consulta en cada rerun;
+    las páginas antiguas se cargan bajo demanda y quedan en sesión (no cambian).
+    """
+    df_first, next_cursor = note_service.fetch_agent_history(conn, user_id)
+    if df_first.empty:
+        st.info("No records found.")
+        return
+
+    # Si la primera página cambió (nota nueva), las páginas cargadas ya no encajan: se descartan
+    hist = st.session_state.get("hist_pages")
+    if not hist or hist["anchor"] != next_cursor:
+        hist = {"anchor": next_cursor, "pages": [], "next": next_cursor}
+        st.session_state.hist_pages = hist
+
+    df_hist = pd.concat([df_first] + hist["pages"], ignore_index=True)
+    st.dataframe(df_hist, hide_index=True, use_container_width=True)
+
+    if hist["next"] is not None:
+        if st.button(f"⬇️ Load older ({len(df_hist)} shown)", key="hist_more"):
+            df_more, hist["next"] = note_service.fetch_agent_history(conn, user_id, cursor=hist["next"])
+            if not df_more.empty:
+                hist["pages"].append(df_more)
+            st.rerun()
+
 # ==============================================================================
 # 4. VISTA PRINCIPAL
 # ==============================================================================
@@ -367,37 +384,34 @@ def show():
                 save_ready = bool(name != 'unknown' and cid != 'unknown' and st.session_state.final_note_content)
 
                 if st.button("💾 Save Log", type="primary", use_container_width=True, disabled=not save_ready):
-                    if _is_duplicate_submission(clean_id_num):
-                        st.warning(f"⚠️ Duplicate for ID {clean_id_num}")
-                    else:
-                        # --- DETERMINAR INFO_UNTIL SEGÚN EL RESULTADO ---
-                        if "Not Completed" in st.session_state.lp_outcome:
-                            final_stage_db = st.session_state.get("lp_stage", "Unknown")
-                            
-                            # Lógica de Transferencia para NO Completados
-                            if st.session_state.get("lp_trans") == "Unsuccessful":
-                                final_transfer_status = st.session_state.get("lp_trans_reason", "Unsuccessful")
-                            else:
-                                final_transfer_status = "Successful" # Opcional: Puedes poner None aquí también si prefieres
+                    # --- DETERMINAR INFO_UNTIL SEGÚN EL RESULTADO ---
+                    if "Not Completed" in st.session_state.lp_outcome:
+                        final_stage_db = st.session_state.get("lp_stage", "Unknown")
+                        
+                        # Lógica de Transferencia para NO Completados
+                        if st.session_state.get("lp_trans") == "Unsuccessful":
+                            final_transfer_status = st.session_state.get("lp_trans_reason", "Unsuccessful")
                         else:
-                            # Caso COMPLETED
-                            final_stage_db = st.session_state.get("lp_completed_source", "All info provided")
-                            final_transfer_status = None  # <--- CORRECCIÓN: Vacío si es Completed
-
-                        payload = {
-                            "user_id": user_id if user_id else 1,
-                            "username": username,
-                            "customer": name,
-                            "cordoba_id": clean_id_num,
-                            "result": st.session_state.lp_outcome.replace("❌ ", "").replace("✅ ", ""),
-                            "affiliate": final_aff,
-                            "info_until": final_stage_db,
-                            "client_language": parsed_check.get('language', 'Unknown'),
-                            "comments": st.session_state.get("lp_reason", ""),
-                            "full_note_content": st.session_state.final_note_content,
-                            "transfer_status": final_transfer_status # Se guarda lo que definimos arriba
-                        }
-                        render_confirm_modal(conn, payload)
+                            final_transfer_status = "Successful" # Opcional: Puedes poner None aquí también si prefieres
+                    else:
+                        # Caso COMPLETED
+                        final_stage_db = st.session_state.get("lp_completed_source", "All info provided")
+                        final_transfer_status = None  # <--- CORRECCIÓN: Vacío si es Completed
+
+                    payload = {
+                        "user_id": user_id if user_id else 1,
+                        "username": username,
+                        "customer": name,
+                        "cordoba_id": clean_id_num,
+                        "result": st.session_state.lp_outcome.replace("❌ ", "").replace("✅ ", ""),
+                        "affiliate": final_aff,
+                        "info_until": final_stage_db,
+                        "client_language": parsed_check.get('language', 'Unknown'),
+                        "comments": st.session_state.get("lp_reason", ""),
+                        "full_note_content": st.session_state.final_note_content,
+                        "transfer_status": final_transfer_status # Se guarda lo que definimos arriba
+                    }
+                    render_confirm_modal(conn, payload)
 
             # 3. RESET
             with b_reset:
@@ -450,11 +464,7 @@ def show():
     st.markdown("---")
     st.subheader(f"📜 Recent Activity ({username})")
     
-    df_hist = note_service.fetch_agent_history(conn, username)
-    if not df_hist.empty:
-        st.dataframe(df_hist, hide_index=True, use_container_width=True)
-    else:
-        st.info("No records found for today.")
+    _render_history(conn, user_id)
 
 if __name__ == "__main__":
     show()
\ No newline at end of file
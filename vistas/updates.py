@@ -16,6 +16,15 @@ ICONS = {
     'SUCCESS':  '🎉'
 }
 
+def _on_mark_read(conn, uid: int, username: str):
+    # Callback: se encola la escritura y el set de leídos de la sesión se actualiza en memoria
+    if service.mark_as_read(conn, uid, username):
+        service.remember_reads(st.session_state, username, [uid])
+
+def _on_mark_all(conn, username: str):
+    marked = service.mark_many_as_read(conn, username)
+    service.remember_reads(st.session_state, username, marked)
+
 def _render_expander_item(conn, row: pd.Series, is_read: bool, username: str):
     """Renderiza la noticia usando SOLO componentes nativos de Streamlit."""
     
@@ -42,7 +51,13 @@ def _render_expander_item(conn, row: pd.Series, is_read: bool, username: str):
 
     # --- DISEÑO UNIFICADO (EXPANDERS) ---
     
-    if not is_read:
+    if not row.get('active', True):
+        # === ARCHIVADA (solo aparece al buscar con "Archivadas") ===
+        with st.expander(f"🗄️ {date_str} | {title}", expanded=False):
+            st.caption(f"Noticia archivada · Categoría: {cat}")
+            st.markdown(msg)
+
+    elif not is_read:
         # === MODO PENDIENTE ===
         # Título visualmente distintivo
         label = f"{icon} [{cat}] {title}  | 📅 {date_str}"
@@ -61,9 +76,8 @@ def _render_expander_item(conn, row: pd.Series, is_read: bool, username: str):
             c_spacer, c_btn = st.columns([3, 1])
             with c_btn:
                 btn_type = "primary" if cat == "CRITICAL" else "secondary"
-                if st.button(f"Marcar como Leído", key=f"read_{uid}", type=btn_type, use_container_width=True):
-                    if service.mark_as_read(conn, uid, username):
-                        st.rerun()
+                st.button(f"Marcar como Leído", key=f"read_{uid}", type=btn_type, use_container_width=True,
+                          on_click=_on_mark_read, args=(conn, uid, username))
 
     else:
         # === MODO LEÍDO ===
@@ -85,41 +99,62 @@ def show():
     with c2:
         if st.button("🔄", help="Refrescar"):
             st.cache_data.clear()
+            service.forget_reads(st.session_state)
             st.rerun()
 
-    # 1. Obtener Datos
-    df = service.fetch_updates(conn)
+    # 1. Filtros
+    c_search, c_arch, c_filt = st.columns([3, 1, 1])
+    search = c_search.text_input("Buscar", placeholder="Buscar en título y mensaje...", label_visibility="collapsed").strip()
+    include_archived = c_arch.toggle("Archivadas", help="Buscar también en noticias archivadas")
+    filtro = c_filt.selectbox("Ver", ["Todos", "Pendientes", "Leídos"], label_visibility="collapsed")
+
+    # 2. Obtener Datos
+    searching = bool(search) or include_archived
+    if searching:
+        # Búsqueda de texto completo en el servidor, paginada y por relevancia
+        query_key = (search, include_archived)
+        if st.session_state.get("upd_query") != query_key:
+            st.session_state.upd_query = query_key
+            st.session_state.upd_page = 1
+        df, total = service.search_updates(conn, search, include_archived, st.session_state.get("upd_page", 1))
+        pages = -(-total // service.UPDATES_PAGE_SIZE)
+        c_cnt, c_pag = st.columns([3, 1])
+        c_cnt.caption(f"{total} resultados" + (" (más relevantes primero)" if search else ""))
+        if pages > 1:
+            st.session_state.upd_page = min(st.session_state.get("upd_page", 1), pages)
+            c_pag.number_input("Página", min_value=1, max_value=pages, key="upd_page")
+    else:
+        df = service.rerun_updates(conn, st.session_state)
+
     if df.empty:
-        st.info("No hay anuncios activos.")
+        st.info("Sin coincidencias." if searching else "No hay anuncios activos.")
         return
 
-    # 2. Cruzar con Leídos
-    read_ids = service.fetch_read_ids(conn, username)
+    # 3. Cruzar con Leídos
+    read_ids = service.session_read_ids(conn, username, st.session_state)
     df['is_read'] = df['id'].isin(read_ids)
+    if 'active' not in df.columns: df['active'] = True
 
-    # 3. Filtros
-    c_search, c_filt = st.columns([3, 1])
-    search = c_search.text_input("Buscar", placeholder="Filtrar...", label_visibility="collapsed")
-    filtro = c_filt.selectbox("Ver", ["Todos", "Pendientes", "Leídos"], label_visibility="collapsed")
-
-    if search:
-        mask = df['title'].str.contains(search, case=False, na=False) | df['message'].str.contains(search, case=False, na=False)
-        df = df[mask]
-    
     if filtro == "Pendientes": df = df[df['is_read'] == False]
     elif filtro == "Leídos": df = df[df['is_read'] == True]
 
-    # 4. Ordenar: Pendientes Críticos -> Pendientes Nuevos -> Leídos
-    df = df.sort_values(by=['is_read', 'date'], ascending=[True, False])
+    # 4. Ordenar: Pendientes Críticos -> Pendientes Nuevos -> Leídos (la búsqueda conserva la relevancia)
+    if not searching:
+        df = df.sort_values(by=['is_read', 'date'], ascending=[True, False])
 
     st.write("")
 
     # 5. Renderizar
+    archivadas = df[df['active'] == False]
+    df = df[df['active'] == True]
     pendientes = df[df['is_read'] == False]
     leidos = df[df['is_read'] == True]
 
     if not pendientes.empty:
-        st.caption("🔴 Pendientes")
+        c_cap, c_all = st.columns([3, 1])
+        c_cap.caption("🔴 Pendientes")
+        # Un solo INSERT ... SELECT para todas las activas sin leer
+        c_all.button("✅ Marcar todo como leído", use_container_width=True, on_click=_on_mark_all, args=(conn, username))
         for _, row in pendientes.iterrows():
             _render_expander_item(conn, row, False, username)
         st.write("")
@@ -130,5 +165,11 @@ def show():
         for _, row in leidos.iterrows():
             _render_expander_item(conn, row, True, username)
 
+    if not archivadas.empty:
+        if not (pendientes.empty and leidos.empty): st.markdown("---")
+        st.caption("🗄️ Archivadas")
+        for _, row in archivadas.iterrows():
+            _render_expander_item(conn, row, True, username)
+
 if __name__ == "__main__":
     show()
\ No newline at end of file